@@ -4,97 +4,351 @@ Assistant Bridge - Interface for the local assistant to communicate
 This script can be used by your local assistant to read user messages and send responses
 """
 
-import json
-import os
-from datetime import datetime
-import time
+import asyncio
+import collections
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from message_store import open_store, format_position, parse_before
+
+# Seconds between checks for stop() while monitoring an idle inbox
+STOP_CHECK_INTERVAL = 1.0
+
+class OrderedDispatcher:
+    """
+    Runs callbacks on an executor and delivers their results in order per key
+    
+    Callbacks for different keys (conversations) finish in any order; a
+    result is delivered only after every earlier result with the same key.
+    """
+    
+    def __init__(self, executor, deliver):
+        self.executor = executor
+        self.deliver = deliver
+        self._pending = {}
+        self._lock = threading.Lock()
+    
+    def submit(self, key, callback, msg):
+        future = self.executor.submit(callback, msg)
+        with self._lock:
+            self._pending.setdefault(key, collections.deque()).append((future, msg))
+        future.add_done_callback(lambda _: self._flush(key))
+    
+    def _flush(self, key):
+        with self._lock:
+            pending = self._pending.get(key)
+            while pending and pending[0][0].done():
+                future, msg = pending.popleft()
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error handling message: {e}")
+                    continue
+                self.deliver(msg, result)
+            if pending is not None and not pending:
+                del self._pending[key]
 
 class AssistantBridge:
-    def __init__(self):
-        self.inbox_file = "assistant_inbox.json"
-        self.outbox_file = "assistant_outbox.json"
+    def __init__(self, consumer="assistant", store=None):
+        self.consumer = consumer
+        self.store = store or open_store()
+        self._watcher = None
+        self._stop = threading.Event()
+        # Explicit acknowledgement: last seq handed out, and those not acked yet
+        self._delivered = None
+        self._unacked = set()
+        self._ack_lock = threading.Lock()
         
-    def get_new_messages(self):
-        """Get unread messages from user"""
-        if not os.path.exists(self.inbox_file):
-            return []
+    def get_new_messages(self, ack=True):
+        """
+        Get unread messages from user
         
+        With ack=False the messages are only handed out; call ack() once they
+        are handled, or they are delivered again after a restart.
+        """
         try:
-            with open(self.inbox_file, 'r') as f:
-                messages = json.load(f)
-            
-            # Get unread messages
-            unread = [m for m in messages if not m.get('read', False)]
-            
-            # Mark as read
-            for msg in messages:
-                if not msg.get('read', False):
-                    msg['read'] = True
+            if ack:
+                # Read past our cursor and advance it
+                return self.store.read_new('inbox', self.consumer)
             
-            # Save back
-            with open(self.inbox_file, 'w') as f:
-                json.dump(messages, f, indent=2)
-            
-            return unread
+            with self._ack_lock:
+                if self._delivered is None:
+                    self._delivered = self.store.get_cursor('inbox', self.consumer)
+                messages = self.store.read_after('inbox', self._delivered)
+                if messages:
+                    self._delivered = messages[-1]['seq']
+                    self._unacked.update(msg['seq'] for msg in messages)
+                return messages
             
         except Exception as e:
             print(f"Error reading messages: {e}")
             return []
     
-    def send_message(self, message):
-        """Send a response back to the user"""
-        if not os.path.exists(self.outbox_file):
-            messages = []
-        else:
-            try:
-                with open(self.outbox_file, 'r') as f:
-                    messages = json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError, PermissionError):
-                messages = []
+    def ack(self, ids):
+        """
+        Acknowledge handled messages (dicts or seq numbers) with one cursor write
         
-        messages.append({
-            "timestamp": datetime.now().isoformat(),
-            "sender": "assistant",
-            "message": message,
-            "read": False
-        })
+        The cursor only moves up to the oldest message still unacknowledged.
+        """
+        try:
+            with self._ack_lock:
+                for msg in ids:
+                    self._unacked.discard(msg['seq'] if isinstance(msg, dict) else msg)
+                if self._delivered is None:
+                    return True
+                seq = min(self._unacked) - 1 if self._unacked else self._delivered
+                self.store.set_cursor('inbox', self.consumer, seq)
+            return True
+        except Exception as e:
+            print(f"Error acknowledging messages: {e}")
+            return False
+    
+    def wait_for_messages(self, timeout=None):
+        """
+        Block until the inbox changes (or timeout seconds pass)
+        
+        Returns True if the inbox changed. The watcher is created on first
+        use, so changes made after that are never missed.
+        """
+        if self._watcher is None:
+            self._watcher = self.store.watch('inbox')
+            return True
+        return self._watcher.wait(timeout)
+    
+    def get_history(self, before=None, limit=50):
+        """
+        Page back through the whole conversation, newest page first
         
+        before is None for the newest messages, or the token returned with
+        the previous page (an ISO timestamp also works). Returns
+        (messages, before) where before is None once nothing older is left.
+        """
         try:
-            with open(self.outbox_file, 'w') as f:
-                json.dump(messages, f, indent=2)
+            position = parse_before(self.store, before) if before else None
+            messages, position = self.store.history(position, limit)
+            return messages, position and format_position(position)
+            
+        except Exception as e:
+            print(f"Error reading history: {e}")
+            return [], None
+    
+    def send_message(self, message, **fields):
+        """Send a response back to the user (fields are stored with it)"""
+        try:
+            self.store.append('outbox', "assistant", message, **fields)
             return True
         except Exception as e:
             print(f"Error sending message: {e}")
             return False
     
-    def monitor_and_respond(self, response_callback):
+    def send_messages(self, messages):
+        """
+        Send several responses with a single write
+        
+        Each item is a string, or a dict with 'message' and extra fields.
+        """
+        try:
+            batch = [dict(msg) if isinstance(msg, dict) else {'message': msg} for msg in messages]
+            for msg in batch:
+                msg['sender'] = "assistant"
+            self.store.append_many('outbox', batch)
+            return True
+        except Exception as e:
+            print(f"Error sending messages: {e}")
+            return False
+    
+    def monitor_and_respond(self, response_callback, workers=0, processes=False,
+                            initializer=None, initargs=()):
         """
         Monitor for new messages and call response_callback for each new message
         
         Args:
             response_callback: Function that takes a message dict and returns a response string
+            workers: Run up to this many callbacks at once (0: one at a time, in this thread)
+            processes: Use worker processes instead of threads, for CPU-heavy logic;
+                the callback and its messages must then be picklable
+            initializer: Called with initargs once in every worker as it starts,
+                e.g. to load a model
+        
+        With workers, responses to messages of one conversation (their
+        'conversation' field, if any) are still sent in the order the
+        messages arrived; other conversations don't wait for a slow one.
         """
         print("Assistant Bridge monitoring started...")
         print("Press Ctrl+C to stop")
         
+        executor = dispatcher = None
+        if workers:
+            pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+            executor = pool(workers, initializer=initializer, initargs=initargs)
+            dispatcher = OrderedDispatcher(executor, self._respond)
+        
+        self._stop.clear()
         try:
-            while True:
+            while not self._stop.is_set():
+                if not self.wait_for_messages(timeout=STOP_CHECK_INTERVAL):
+                    continue
                 messages = self.get_new_messages()
                 
                 for msg in messages:
                     print(f"\n[{msg['timestamp']}] New message: {msg['message']}")
                     
-                    # Call the callback to get response
-                    response = response_callback(msg)
-                    
-                    if response:
-                        self.send_message(response)
-                        print(f"Response sent: {response}")
-                
-                time.sleep(1)
+                    if dispatcher:
+                        dispatcher.submit(msg.get('conversation'), response_callback, msg)
+                    else:
+                        # Call the callback to get response
+                        self._respond(msg, response_callback(msg))
                 
         except KeyboardInterrupt:
             print("\nAssistant Bridge stopped")
+        finally:
+            if executor:
+                # Messages already taken from the inbox still get their answers
+                executor.shutdown(wait=True)
+    
+    def stop(self):
+        """Make monitor_and_respond() return (from another thread)"""
+        self._stop.set()
+    
+    def _respond(self, msg, response):
+        if response:
+            # Replies stay in the conversation they answer
+            fields = {'conversation': msg['conversation']} if 'conversation' in msg else {}
+            self.send_message(response, **fields)
+            print(f"Response sent: {response}")
+
+class AsyncAssistantBridge:
+    """
+    asyncio version of AssistantBridge
+    
+    Waiting never blocks the event loop: inotify changes are read straight
+    from the loop, everything else (store I/O, other watchers) runs in worker
+    threads.
+    """
+    
+    def __init__(self, consumer="assistant", store=None):
+        self.bridge = AssistantBridge(consumer, store)
+        self._watcher = None
+        self._stopped = False
+    
+    async def get_new_messages(self, ack=True):
+        """Get unread messages from user, see AssistantBridge.get_new_messages"""
+        return await asyncio.to_thread(self.bridge.get_new_messages, ack)
+    
+    async def ack(self, ids):
+        """Acknowledge handled messages, see AssistantBridge.ack"""
+        return await asyncio.to_thread(self.bridge.ack, list(ids))
+    
+    async def get_history(self, before=None, limit=50):
+        """Page back through the conversation, see AssistantBridge.get_history"""
+        return await asyncio.to_thread(self.bridge.get_history, before, limit)
+    
+    async def send_message(self, message, **fields):
+        """Send a response back to the user"""
+        return await asyncio.to_thread(self.bridge.send_message, message, **fields)
+    
+    async def send_messages(self, messages):
+        """Send several responses with a single write"""
+        return await asyncio.to_thread(self.bridge.send_messages, list(messages))
+    
+    async def wait_for_messages(self, timeout=None):
+        """Wait until the inbox changes; same contract as AssistantBridge"""
+        if self._watcher is None:
+            self._watcher = await asyncio.to_thread(self.bridge.store.watch, 'inbox')
+            return True
+        if hasattr(self._watcher, 'fileno'):
+            return await self._wait_readable(timeout)
+        
+        # Short slices, so a cancelled wait doesn't leave a thread blocked for long
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            remaining = STOP_CHECK_INTERVAL if deadline is None else deadline - loop.time()
+            if remaining <= 0:
+                return False
+            if await asyncio.to_thread(self._watcher.wait, min(remaining, STOP_CHECK_INTERVAL)):
+                return True
+    
+    async def _wait_readable(self, timeout):
+        loop = asyncio.get_running_loop()
+        fd = self._watcher.fileno()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            ready = loop.create_future()
+            loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+            try:
+                remaining = None if deadline is None else max(0, deadline - loop.time())
+                await asyncio.wait_for(ready, remaining)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                loop.remove_reader(fd)
+            if self._watcher.drain():
+                return True
+    
+    async def messages(self):
+        """Yield new messages as they arrive: async for msg in bridge.messages()"""
+        self._stopped = False
+        while not self._stopped:
+            if await self.wait_for_messages(timeout=STOP_CHECK_INTERVAL):
+                for msg in await self.get_new_messages():
+                    yield msg
+    
+    async def monitor_and_respond(self, response_callback, limit=None):
+        """
+        Answer every new message until stop() is called
+        
+        Args:
+            response_callback: Function or coroutine function that takes a message
+                dict and returns a response string; plain functions run in a thread
+            limit: Most messages being handled at once (None: no limit)
+        
+        Each message gets its own task; responses to one conversation are
+        still sent in the order its messages arrived.
+        """
+        slots = asyncio.Semaphore(limit) if limit else None
+        latest = {}
+        tasks = set()
+        try:
+            async for msg in self.messages():
+                if slots:
+                    await slots.acquire()
+                key = msg.get('conversation')
+                task = asyncio.create_task(self._handle(msg, response_callback, latest.get(key), slots))
+                latest[key] = task
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                task.add_done_callback(lambda t, key=key: latest.get(key) is t and latest.pop(key))
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _handle(self, msg, response_callback, previous, slots):
+        try:
+            try:
+                if inspect.iscoroutinefunction(response_callback):
+                    response = await response_callback(msg)
+                else:
+                    response = await asyncio.to_thread(response_callback, msg)
+            except Exception as e:
+                print(f"Error handling message: {e}")
+                response = None
+            if previous is not None:
+                # Wait for the conversation's earlier reply, whatever became of it
+                await asyncio.wait([previous])
+            await asyncio.to_thread(self.bridge._respond, msg, response)
+        finally:
+            if slots:
+                slots.release()
+    
+    def stop(self):
+        """Make messages() and monitor_and_respond() finish"""
+        self._stopped = True
+    
+    def close(self):
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
 
 def example_response_handler(message):
     """
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the communication system
+Run: python3 benchmark.py <scenario>  (or without arguments for the list)
+"""
+
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from message_store import open_log
+from file_watcher import watch, PollingWatcher
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2]
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return p50, p99
+
+
+def bench_latency(rounds=200):
+    """Time from appending a message until a watching consumer has read it"""
+    for name, factory in (("auto", watch), ("polling", PollingWatcher)):
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = open_log('inbox', tmp)
+            reader = open_log('inbox', tmp)
+            watcher = factory([reader.path])
+            sent = {}
+            latencies = []
+            done = threading.Event()
+
+            def consume():
+                while len(latencies) < rounds:
+                    watcher.wait(timeout=1.0)
+                    for record in reader.read_new('bench'):
+                        latencies.append(time.perf_counter() - sent[record['seq']])
+                done.set()
+
+            thread = threading.Thread(target=consume, daemon=True)
+            thread.start()
+            for i in range(rounds):
+                sent[i + 1] = time.perf_counter()
+                writer.append("user", f"message {i}")
+                time.sleep(0.005)
+            done.wait(30)
+            watcher.close()
+
+            p50, p99 = _percentiles(latencies)
+            print(f"{name:>8} ({type(watcher).__name__}): pickup p50 {p50 * 1000:.2f} ms, "
+                  f"p99 {p99 * 1000:.2f} ms, mean {statistics.mean(latencies) * 1000:.2f} ms")
+
+
+def bench_socket(rounds=2000):
+    """Round trip through the Unix socket broker: user sends, assistant replies"""
+    from socket_transport import MessageBroker, BrokerStore
+    from assistant_bridge import AssistantBridge
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/bench.sock"
+        broker = MessageBroker(path)
+        threading.Thread(target=broker.serve_forever, daemon=True).start()
+
+        assistant = AssistantBridge(store=BrokerStore(path))
+        user = BrokerStore(path)
+        user_watcher = user.watch('outbox')
+        user.read_new('outbox', 'user')
+
+        def respond():
+            while True:
+                assistant.wait_for_messages()
+                for msg in assistant.get_new_messages():
+                    assistant.send_message(msg['message'])
+
+        threading.Thread(target=respond, daemon=True).start()
+
+        samples = []
+        for i in range(rounds):
+            start = time.perf_counter()
+            user.append('inbox', "user", f"ping {i}")
+            while not user.read_new('outbox', 'user'):
+                user_watcher.wait(timeout=1.0)
+            samples.append(time.perf_counter() - start)
+
+        p50, p99 = _percentiles(samples)
+        print(f"socket broker round trip: p50 {p50 * 1000:.3f} ms, p99 {p99 * 1000:.3f} ms "
+              f"({rounds} messages)")
+        broker.shutdown()
+        broker.server_close()
+
+
+def _serve_web(directory, single, ports):
+    """Server process for bench_web"""
+    import web_communication
+    from message_store import JsonlStore
+
+    web_communication.CommunicationHandler.store = JsonlStore(directory)
+    server = web_communication.make_server(0, single_threaded=single)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def _poll_web(port, threads, stop):
+    """Poller process for bench_web: `threads` clients fetching the full history"""
+    import http.client
+
+    def poll():
+        while not stop.is_set():
+            try:
+                conn = http.client.HTTPConnection('localhost', port, timeout=60)
+                conn.request('GET', '/api/messages')
+                conn.getresponse().read()
+            except OSError:
+                pass
+
+    workers = [threading.Thread(target=poll) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+
+def bench_web(pollers=50, sends=100, history=1000, processes=5):
+    """Send latency while 50 clients poll /api/messages, single-threaded vs pooled"""
+    import http.client
+    import json
+    import multiprocessing
+    from message_store import JsonlStore
+
+    for single in (True, False):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = JsonlStore(tmp)
+            for i in range(history):
+                store.append('inbox' if i % 2 else 'outbox', "user", f"history {i}")
+
+            # Server, pollers and the measuring client each get their own process
+            ports = multiprocessing.Queue()
+            server = multiprocessing.Process(target=_serve_web, args=(tmp, single, ports), daemon=True)
+            server.start()
+            port = ports.get()
+
+            stop = multiprocessing.Event()
+            clients = [
+                multiprocessing.Process(target=_poll_web, args=(port, pollers // processes, stop))
+                for _ in range(processes)
+            ]
+            for p in clients:
+                p.start()
+            time.sleep(1)
+
+            samples = []
+            body = json.dumps({"message": "benchmark"})
+            for _ in range(sends):
+                start = time.perf_counter()
+                conn = http.client.HTTPConnection('localhost', port, timeout=60)
+                conn.request('POST', '/api/send', body, {'Content-Type': 'application/json'})
+                conn.getresponse().read()
+                samples.append(time.perf_counter() - start)
+
+            stop.set()
+            for p in clients:
+                p.join()
+            server.terminate()
+            server.join()
+
+        p50, p99 = _percentiles(samples)
+        name = "single-threaded" if single else "pooled"
+        print(f"{name:>16}: /api/send p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms "
+              f"({pollers} pollers, {history} messages of history)")
+
+
+def bench_batch(total=5000):
+    """Messages per second sent one at a time vs. in batches, per backend"""
+    from message_store import open_store
+
+    for backend in ("jsonl", "sqlite"):
+        for size in (1, 10, 100, 1000):
+            with tempfile.TemporaryDirectory() as tmp:
+                store = open_store(backend, tmp)
+                batch = [{'sender': "assistant", 'message': f"reply {i}"} for i in range(size)]
+                started = time.perf_counter()
+                for _ in range(total // size):
+                    if size == 1:
+                        store.append('outbox', "assistant", "reply")
+                    else:
+                        store.append_many('outbox', batch)
+                elapsed = time.perf_counter() - started
+                store.close()
+            print(f"{backend:>7} batch {size:>4}: {total / elapsed:>9.0f} msg/s")
+
+
+SCENARIOS = {
+    'latency': bench_latency,
+    'socket': bench_socket,
+    'web': bench_web,
+    'batch': bench_batch,
+}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in SCENARIOS:
+        print("Usage: python3 benchmark.py <scenario>")
+        print("Scenarios: " + ", ".join(SCENARIOS))
+        sys.exit(1)
+    SCENARIOS[sys.argv[1]]()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,43 +6,62 @@ A simple GUI interface to communicate with a local assistant
 
 import tkinter as tk
 from tkinter import scrolledtext
-import json
-import os
 from datetime import datetime
+import collections
+import queue
 import threading
-import time
+from message_store import open_store, BOXES
+
+# Milliseconds between UI updates from the monitor thread
+UPDATE_INTERVAL = 50
+# Most messages drawn per update, so a huge burst can't freeze the window
+MAX_BATCH = 500
+
+# Lines kept in the conversation area; older messages are dropped from view
+# and loaded again from the store when scrolled back to
+MAX_LINES = 2000
+# Messages fetched per step when scrolling back through history
+PAGE_SIZE = 50
+
+# Shared Text widget tags: one per kind of message, never one per message
+MESSAGE_STYLES = {
+    'user': "#E3F2FD",
+    'assistant': "#E8F5E9",
+    'system': "#FFEBEE",
+}
 
 class CommunicationWindow:
-    def __init__(self, root):
+    def __init__(self, root, max_lines=MAX_LINES, page_size=PAGE_SIZE):
         self.root = root
         self.root.title("Assistant Communication")
         self.root.geometry("500x600")
+        self.max_lines = max_lines
+        self.page_size = page_size
         
-        # Communication files
-        self.inbox_file = "assistant_inbox.json"
-        self.outbox_file = "assistant_outbox.json"
+        # Message store shared with the assistant (see ASSISTANT_STORE)
+        self.store = open_store()
         
-        # Initialize communication files if they don't exist
-        self._init_files()
+        # ((box, seq) or None, line count) of every message on screen, top to bottom
+        self._shown = collections.deque()
+        self._lines = 0
+        # Start of the history page above the view; None when nothing is older
+        self._before = None
+        self._loading = False
+        self._cleared = False
         
         # Create UI elements
         self._create_ui()
+        self._load_history()
+        
+        # Tk may only be used from this thread; the monitor hands results over
+        self.updates = queue.Queue()
+        self._update_job = self.root.after(UPDATE_INTERVAL, self._drain_updates)
         
         # Start monitoring for responses
         self.running = True
         self.monitor_thread = threading.Thread(target=self._monitor_responses, daemon=True)
         self.monitor_thread.start()
     
-    def _init_files(self):
-        """Initialize communication files"""
-        if not os.path.exists(self.inbox_file):
-            with open(self.inbox_file, 'w') as f:
-                json.dump([], f)
-        
-        if not os.path.exists(self.outbox_file):
-            with open(self.outbox_file, 'w') as f:
-                json.dump([], f)
-    
     def _create_ui(self):
         """Create the user interface"""
         # Title label
@@ -67,7 +86,10 @@ class CommunicationWindow:
             font=("Arial", 10)
         )
         self.conversation_area.pack(fill=tk.BOTH, expand=True)
-        self.conversation_area.config(state=tk.DISABLED)
+        self.conversation_area.tag_config("bold", font=("Arial", 10, "bold"))
+        for tag, bg_color in MESSAGE_STYLES.items():
+            self.conversation_area.tag_config(tag, background=bg_color, lmargin1=10, lmargin2=10)
+        self.conversation_area.config(state=tk.DISABLED, yscrollcommand=self._on_scroll)
         
         # Input area
         input_frame = tk.Frame(self.root)
@@ -130,91 +152,176 @@ class CommunicationWindow:
         if not message:
             return
         
-        # Add to conversation
-        self._add_to_conversation("Vi", message, "#E3F2FD")
-        
-        # Save to inbox file for assistant to read
+        # Append to inbox for assistant to read
         try:
-            with open(self.inbox_file, 'r') as f:
-                messages = json.load(f)
-            
-            messages.append({
-                "timestamp": datetime.now().isoformat(),
-                "sender": "user",
-                "message": message,
-                "read": False
-            })
-            
-            with open(self.inbox_file, 'w') as f:
-                json.dump(messages, f, indent=2)
+            record = self.store.append('inbox', "user", message)
+            self._add_to_conversation("Vi", message, 'user', ('inbox', record['seq']))
             
             self.status_label.config(text="Status: Poruka poslana")
             self.input_field.delete("1.0", tk.END)
             
         except Exception as e:
-            self._add_to_conversation("Sistem", f"Greška: {str(e)}", "#FFEBEE")
+            self._add_to_conversation("Sistem", f"Greška: {str(e)}", 'system')
             self.status_label.config(text=f"Status: Greška - {str(e)}")
     
     def _monitor_responses(self):
-        """Monitor outbox file for assistant responses"""
-        last_check = 0
+        """Monitor outbox for assistant responses"""
+        watcher = self.store.watch('outbox')
+        # Everything up to the newest page shown at startup is on screen
+        seq = self._position['outbox']
+        changed = True
         
         while self.running:
+            if not changed:
+                # Wake up on changes; the timeout only lets us notice shutdown
+                changed = watcher.wait(timeout=1.0)
+                continue
+            changed = False
+            
             try:
-                if os.path.exists(self.outbox_file):
-                    with open(self.outbox_file, 'r') as f:
-                        messages = json.load(f)
-                    
-                    # Check for new messages
-                    unread = [m for m in messages if not m.get('read', False)]
-                    
-                    for msg in unread:
-                        self._add_to_conversation(
-                            "Asistent",
-                            msg.get('message', ''),
-                            "#E8F5E9"
-                        )
-                        msg['read'] = True
-                    
-                    # Update file if there were unread messages
-                    if unread:
-                        with open(self.outbox_file, 'w') as f:
-                            json.dump(messages, f, indent=2)
-                        
-                        self.status_label.config(text="Status: Primljena nova poruka")
+                unread = self.store.read_after('outbox', seq)
+                if unread:
+                    seq = unread[-1]['seq']
+                for msg in unread:
+                    self.updates.put(dict(msg, box='outbox'))
                 
             except Exception as e:
                 print(f"Monitor error: {e}")
-            
-            time.sleep(1)
+        
+        watcher.close()
     
-    def _add_to_conversation(self, sender, message, bg_color):
-        """Add message to conversation display"""
-        self.conversation_area.config(state=tk.NORMAL)
+    def _drain_updates(self):
+        """Draw what the monitor thread received, in one batch (Tk thread)"""
+        entries = []
+        try:
+            while len(entries) < MAX_BATCH:
+                entries.append(self._entry(self.updates.get_nowait()))
+        except queue.Empty:
+            pass
         
-        timestamp = datetime.now().strftime("%H:%M:%S")
+        if entries:
+            self._insert_messages(entries)
+            self.status_label.config(text="Status: Primljena nova poruka")
+        if self.running:
+            self._update_job = self.root.after(UPDATE_INTERVAL, self._drain_updates)
+    
+    def _load_history(self):
+        """Show the newest page of the conversation"""
+        # Read first, so nothing sent meanwhile falls between page and monitor
+        self._position = self.store.head()
+        messages, self._before = self.store.history(
+            {box: seq + 1 for box, seq in self._position.items()}, self.page_size)
+        self._insert_messages([self._entry(msg) for msg in messages])
+    
+    def _on_scroll(self, first, last):
+        """Scrollbar update; fetches older history when the top is reached"""
+        self.conversation_area.vbar.set(first, last)
+        if float(first) <= 0.0 and self._before is not None and not self._loading:
+            self._loading = True
+            self.root.after_idle(self._load_older)
+    
+    def _load_older(self):
+        """Insert the page of history just above the top of the view"""
+        try:
+            messages, self._before = self.store.history(self._before, self.page_size)
+            self._insert_messages([self._entry(msg) for msg in messages], at_top=True)
+        except Exception as e:
+            print(f"History error: {e}")
+        finally:
+            self._loading = False
+    
+    @classmethod
+    def _entry(cls, msg):
+        """Display entry for a stored record tagged with its box"""
+        sender, tag = ("Vi", 'user') if msg['box'] == 'inbox' else ("Asistent", 'assistant')
+        return (sender, msg.get('message', ''), tag, cls._clock(msg.get('timestamp')),
+                (msg['box'], msg['seq']))
+    
+    @staticmethod
+    def _clock(timestamp):
+        """HH:MM:SS of a stored timestamp, or of now if it can't be read"""
+        try:
+            moment = datetime.fromisoformat(str(timestamp).replace('Z', '+00:00'))
+        except ValueError:
+            moment = datetime.now()
+        return moment.strftime("%H:%M:%S")
+    
+    def _add_to_conversation(self, sender, message, tag, key=None):
+        """Add message to conversation display"""
+        self._insert_messages([(sender, message, tag, datetime.now().strftime("%H:%M:%S"), key)])
+    
+    def _insert_messages(self, entries, at_top=False):
+        """
+        Insert (sender, message, tag, time, key) entries with a single redraw
         
-        # Create tags for styling
-        tag_name = f"msg_{timestamp}_{sender}"
-        self.conversation_area.tag_config(tag_name, background=bg_color, lmargin1=10, lmargin2=10)
+        key is (box, seq) of a stored message, so it can be loaded again
+        after being trimmed. Entries go below the conversation, or above it
+        for older history (keeping the view where it is).
+        """
+        if not entries:
+            return
+        chunks, shown = [], []
+        for sender, message, tag, timestamp, key in entries:
+            header, body = f"\n[{timestamp}] {sender}:\n", f"{message}\n"
+            chunks += [header, "bold", body, tag]
+            shown.append((key, header.count("\n") + body.count("\n")))
+        added = sum(lines for _, lines in shown)
         
-        # Insert message
-        self.conversation_area.insert(tk.END, f"\n[{timestamp}] {sender}:\n", "bold")
-        self.conversation_area.insert(tk.END, f"{message}\n", tag_name)
+        area = self.conversation_area
+        area.config(state=tk.NORMAL)
+        if at_top:
+            top = int(area.index("@0,0").split(".")[0])
+            area.insert("1.0", *chunks)
+            self._shown.extendleft(reversed(shown))
+            self._lines += added
+            area.yview(f"{top + added}.0")
+        else:
+            following = area.yview()[1] >= 1.0
+            area.insert(tk.END, *chunks)
+            self._shown.extend(shown)
+            self._lines += added
+            if following:
+                # Only while following, so text being read never moves
+                self._trim()
+                area.see(tk.END)
+        area.config(state=tk.DISABLED)
+    
+    def _trim(self):
+        """Drop the oldest messages from view while there are over max_lines"""
+        removed, trimmed = 0, {}
+        while self._lines - removed > self.max_lines and len(self._shown) > 1:
+            key, lines = self._shown.popleft()
+            removed += lines
+            if key:
+                box, seq = key
+                trimmed[box] = max(trimmed.get(box, 0), seq)
+        if not removed:
+            return
         
-        self.conversation_area.config(state=tk.DISABLED)
-        self.conversation_area.see(tk.END)
+        self.conversation_area.delete("1.0", f"{removed + 1}.0")
+        self._lines -= removed
+        if not self._cleared:
+            # Scrolling to the top brings them back
+            before = self._before or {}
+            self._before = {box: trimmed[box] + 1 if box in trimmed else before.get(box, 1)
+                            for box in BOXES}
     
     def _clear_conversation(self):
         """Clear the conversation display"""
         self.conversation_area.config(state=tk.NORMAL)
         self.conversation_area.delete("1.0", tk.END)
         self.conversation_area.config(state=tk.DISABLED)
+        # Cleared messages are not loaded again when scrolling up
+        self._shown.clear()
+        self._lines = 0
+        self._before = None
+        self._cleared = True
         self.status_label.config(text="Status: Razgovor očišćen")
     
     def on_closing(self):
         """Handle window closing"""
         self.running = False
+        self.root.after_cancel(self._update_job)
         self.root.destroy()
 
 def main():
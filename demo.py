@@ -3,14 +3,27 @@
 Demo script - Simulates a conversation between user and assistant
 """
 
-import json
 import os
 import time
-from datetime import datetime
+from message_store import open_log
+
+DEMO_FILES = [
+    'assistant_inbox.json', 'assistant_outbox.json',
+    'assistant_inbox.jsonl', 'assistant_outbox.jsonl',
+]
+
+DEMO_CONVERSATION = [
+    ('inbox', 'user', "Zdravo! Jesi li tu?"),
+    ('outbox', 'assistant', "Zdravo! Da, tu sam i spreman za pomoć! 👋"),
+    ('inbox', 'user', "Odlično! Trebam pomoć sa organizacijom mapa."),
+    ('outbox', 'assistant', "Mogu ti pomoći! Što točno želiš organizirati?"),
+    ('inbox', 'user', "Desktop mi je prepun datoteka, trebam ih sortirati."),
+    ('outbox', 'assistant', "Super! Mogu ti stvoriti mape po vrsti datoteka i sortirati ih automatski."),
+]
 
 def clear_files():
     """Clear any existing communication files"""
-    for f in ['assistant_inbox.json', 'assistant_outbox.json']:
+    for f in DEMO_FILES:
         if os.path.exists(f):
             os.remove(f)
 
@@ -24,91 +37,12 @@ def create_demo_conversation():
     # Clear existing files
     clear_files()
     
-    # User message 1
-    print("[USER] Zdravo! Jesi li tu?")
-    with open('assistant_inbox.json', 'w') as f:
-        json.dump([{
-            "timestamp": datetime.now().isoformat(),
-            "sender": "user",
-            "message": "Zdravo! Jesi li tu?",
-            "read": False
-        }], f, indent=2)
-    
-    time.sleep(0.5)
-    
-    # Assistant response 1
-    print("[ASSISTANT] Zdravo! Da, tu sam i spreman za pomoć! 👋")
-    with open('assistant_outbox.json', 'w') as f:
-        json.dump([{
-            "timestamp": datetime.now().isoformat(),
-            "sender": "assistant",
-            "message": "Zdravo! Da, tu sam i spreman za pomoć! 👋",
-            "read": False
-        }], f, indent=2)
-    
-    time.sleep(0.5)
-    
-    # User message 2
-    print("[USER] Odlično! Trebam pomoć sa organizacijom mapa.")
-    with open('assistant_inbox.json', 'r') as f:
-        inbox = json.load(f)
-    inbox[0]['read'] = True
-    inbox.append({
-        "timestamp": datetime.now().isoformat(),
-        "sender": "user",
-        "message": "Odlično! Trebam pomoć sa organizacijom mapa.",
-        "read": False
-    })
-    with open('assistant_inbox.json', 'w') as f:
-        json.dump(inbox, f, indent=2)
-    
-    time.sleep(0.5)
-    
-    # Assistant response 2
-    print("[ASSISTANT] Mogu ti pomoći! Što točno želiš organizirati?")
-    with open('assistant_outbox.json', 'r') as f:
-        outbox = json.load(f)
-    outbox[0]['read'] = True
-    outbox.append({
-        "timestamp": datetime.now().isoformat(),
-        "sender": "assistant",
-        "message": "Mogu ti pomoći! Što točno želiš organizirati?",
-        "read": False
-    })
-    with open('assistant_outbox.json', 'w') as f:
-        json.dump(outbox, f, indent=2)
-    
-    time.sleep(0.5)
-    
-    # User message 3
-    print("[USER] Desktop mi je prepun datoteka, trebam ih sortirati.")
-    with open('assistant_inbox.json', 'r') as f:
-        inbox = json.load(f)
-    inbox[1]['read'] = True
-    inbox.append({
-        "timestamp": datetime.now().isoformat(),
-        "sender": "user",
-        "message": "Desktop mi je prepun datoteka, trebam ih sortirati.",
-        "read": False
-    })
-    with open('assistant_inbox.json', 'w') as f:
-        json.dump(inbox, f, indent=2)
-    
-    time.sleep(0.5)
+    logs = {'inbox': open_log('inbox'), 'outbox': open_log('outbox')}
     
-    # Assistant response 3
-    print("[ASSISTANT] Super! Mogu ti stvoriti mape po vrsti datoteka i sortirati ih automatski.")
-    with open('assistant_outbox.json', 'r') as f:
-        outbox = json.load(f)
-    outbox[1]['read'] = True
-    outbox.append({
-        "timestamp": datetime.now().isoformat(),
-        "sender": "assistant",
-        "message": "Super! Mogu ti stvoriti mape po vrsti datoteka i sortirati ih automatski.",
-        "read": False
-    })
-    with open('assistant_outbox.json', 'w') as f:
-        json.dump(outbox, f, indent=2)
+    for box, sender, message in DEMO_CONVERSATION:
+        print(f"[{sender.upper()}] {message}")
+        logs[box].append(sender, message)
+        time.sleep(0.5)
     
     print()
     print("=" * 60)
@@ -116,7 +50,7 @@ def create_demo_conversation():
     print("=" * 60)
     print()
     print("✓ Communication files created with demo conversation")
-    print("✓ Files: assistant_inbox.json, assistant_outbox.json")
+    print("✓ Files: assistant_inbox.jsonl, assistant_outbox.jsonl")
     print()
     print("Now you can open:")
     print("  - communication_window.py (to see the conversation)")
@@ -124,14 +58,14 @@ def create_demo_conversation():
     print()
     
     # Display file contents
-    print("\n📁 assistant_inbox.json:")
+    print("\n📁 assistant_inbox.jsonl:")
     print("-" * 60)
-    with open('assistant_inbox.json', 'r') as f:
+    with open('assistant_inbox.jsonl', 'r', encoding='utf-8') as f:
         print(f.read())
     
-    print("\n📁 assistant_outbox.json:")
+    print("\n📁 assistant_outbox.jsonl:")
     print("-" * 60)
-    with open('assistant_outbox.json', 'r') as f:
+    with open('assistant_outbox.jsonl', 'r', encoding='utf-8') as f:
         print(f.read())
 
 if __name__ == "__main__":
@@ -5,7 +5,6 @@ Demonstrates how to integrate your assistant with the communication window
 """
 
 from assistant_bridge import AssistantBridge
-import time
 
 def simple_assistant_logic(user_message):
     """
@@ -49,6 +48,8 @@ def main():
     # Monitor for messages and respond
     try:
         while True:
+            # Sleep until the inbox actually changes
+            bridge.wait_for_messages()
             messages = bridge.get_new_messages()
             
             for msg in messages:
@@ -63,8 +64,6 @@ def main():
                 # Send response
                 bridge.send_message(response)
                 print(f"[ODGOVOR] {response}\n")
-            
-            time.sleep(1)
     
     except KeyboardInterrupt:
         print("\n\nAsistent zaustavljen. Doviđenja!")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+File Watcher - Wake up when the communication files change
+Uses Linux inotify when it is available and falls back to a stat() poller
+that backs off while nothing is happening.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct("iIII")
+
+# Poller intervals in seconds
+MIN_POLL_INTERVAL = 0.01
+MAX_POLL_INTERVAL = 1.0
+
+
+class InotifyWatcher:
+    """Blocks in select() on an inotify descriptor watching the files' directories"""
+
+    def __init__(self, paths, libc):
+        self.names = {}
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        try:
+            for path in paths:
+                directory, name = os.path.split(os.path.abspath(path))
+                wd = libc.inotify_add_watch(self.fd, directory.encode(), WATCH_MASK)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+                self.names.setdefault(wd, set()).add(name)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def wait(self, timeout=None):
+        """Block until a watched file changes; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return False
+            if self.drain():
+                return True
+
+    def fileno(self):
+        """Descriptor that becomes readable on changes, for event loops"""
+        return self.fd
+
+    def drain(self):
+        """Consume queued events and report whether any concern our files"""
+        changed = False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+
+        pos = 0
+        while pos + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            name = data[pos:pos + length].rstrip(b"\0").decode(errors='replace')
+            pos += length
+            if name in self.names.get(wd, ()):
+                changed = True
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """Portable fallback: compares stat() results, polling less often while idle"""
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.interval = MIN_POLL_INTERVAL
+        self._snapshot = self._stat_all()
+
+    def wait(self, timeout=None):
+        """Block until a watched file changes; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            current = self._stat_all()
+            if current != self._snapshot:
+                self._snapshot = current
+                self.interval = MIN_POLL_INTERVAL
+                return True
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+            sleep = self.interval
+            if deadline is not None:
+                sleep = min(sleep, max(0, deadline - time.monotonic()))
+            time.sleep(sleep)
+            self.interval = min(self.interval * 2, MAX_POLL_INTERVAL)
+
+    def _stat_all(self):
+        result = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                result.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except OSError:
+                result.append(None)
+        return result
+
+    def close(self):
+        pass
+
+
+def _load_libc():
+    if not hasattr(os, 'uname') or os.uname().sysname != 'Linux':
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+def watch(paths):
+    """Create the best available watcher for the given file paths"""
+    libc = _load_libc()
+    if libc is not None:
+        try:
+            return InotifyWatcher(paths, libc)
+        except OSError as e:
+            print(f"inotify unavailable ({e}), falling back to polling")
+    return PollingWatcher(paths)
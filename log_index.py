@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Log Index - Sidecar offset index for the JSON Lines message logs
+Maps every record's sequence number and timestamp to its byte offset, so a
+page of older messages is read with one seek instead of parsing the whole
+log. Readers bring the index up to date lazily; writers never touch it.
+"""
+
+import bisect
+import json
+import os
+import struct
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows - single process use only
+    fcntl = None
+
+# seq, byte offset of the record's line, timestamp in epoch seconds
+ENTRY = struct.Struct("!QQd")
+
+
+def epoch_seconds(timestamp, default):
+    """ISO timestamp as epoch seconds; default if it can't be parsed"""
+    try:
+        return datetime.fromisoformat(str(timestamp).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return default
+
+
+class _Column:
+    """Read-only sequence of one field of the index entries, for bisect"""
+
+    def __init__(self, f, count, field):
+        self.f = f
+        self.count = count
+        self.field = field
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        self.f.seek(i * ENTRY.size)
+        return ENTRY.unpack(self.f.read(ENTRY.size))[self.field]
+
+
+class LogIndex:
+    """Fixed-width (seq, offset, timestamp) entries for one log, one per record"""
+
+    def __init__(self, log_path, path=None):
+        self.log_path = log_path
+        self.path = path or os.path.splitext(log_path)[0] + ".idx"
+        self._lock = threading.Lock()
+
+    def update(self):
+        """Index the records appended to the log since the last update"""
+        if not os.path.exists(self.log_path):
+            return
+
+        with self._lock, open(self.path, 'a+b') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                self._catch_up(f)
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _catch_up(self, f):
+        count = os.fstat(f.fileno()).st_size // ENTRY.size
+        offset, timestamp = 0, 0.0
+
+        with open(self.log_path, 'rb') as log:
+            if count:
+                f.seek((count - 1) * ENTRY.size)
+                seq, offset, timestamp = ENTRY.unpack(f.read(ENTRY.size))
+                log.seek(offset)
+                line = log.readline()
+                if line.endswith(b"\n") and self._seq(line) == seq:
+                    offset += len(line)
+                else:
+                    # Log was replaced or truncated - index it from scratch
+                    count, offset, timestamp = 0, 0, 0.0
+            # Drops a half-written entry as well as a stale index
+            f.truncate(count * ENTRY.size)
+
+            log.seek(offset)
+            data = log.read()
+
+        entries = []
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # still being written
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            if isinstance(record, dict):
+                # Keep the column sorted for bisect even if a timestamp is bad
+                timestamp = max(timestamp, epoch_seconds(record.get("timestamp"), timestamp))
+                entries.append(ENTRY.pack(record.get("seq", 0), offset, timestamp))
+            offset += len(line)
+
+        if entries:
+            f.seek(0, os.SEEK_END)
+            f.write(b"".join(entries))
+            f.flush()
+
+    @staticmethod
+    def _seq(line):
+        try:
+            return json.loads(line).get("seq")
+        except (json.JSONDecodeError, AttributeError):
+            return None
+
+    def locate(self, before, limit):
+        """
+        Where the last `limit` records with seq below `before` start
+
+        Returns (offset, count); count is 0 when there are none.
+        """
+        with open(self.path, 'rb') as f:
+            seqs = _Column(f, os.fstat(f.fileno()).st_size // ENTRY.size, 0)
+            end = bisect.bisect_left(seqs, before)
+            start = max(0, end - limit)
+            if start == end:
+                return 0, 0
+            f.seek(start * ENTRY.size)
+            return ENTRY.unpack(f.read(ENTRY.size))[1], end - start
+
+    def offset_of(self, seq):
+        """
+        Where to start reading for the records with at least this seq
+
+        That is the first such record, or the last indexed one if none is
+        newer. None when the index is empty.
+        """
+        with open(self.path, 'rb') as f:
+            seqs = _Column(f, os.fstat(f.fileno()).st_size // ENTRY.size, 0)
+            if not seqs:
+                return None
+            i = min(bisect.bisect_left(seqs, seq), len(seqs) - 1)
+            f.seek(i * ENTRY.size)
+            return ENTRY.unpack(f.read(ENTRY.size))[1]
+
+    def seq_at(self, timestamp):
+        """
+        Sequence number of the first record at or after an ISO timestamp
+
+        None when every indexed record is older.
+        """
+        moment = epoch_seconds(timestamp, None)
+        if moment is None:
+            raise ValueError(f"Invalid timestamp: {timestamp!r}")
+        with open(self.path, 'rb') as f:
+            times = _Column(f, os.fstat(f.fileno()).st_size // ENTRY.size, 2)
+            i = bisect.bisect_left(times, moment)
+            if i == len(times):
+                return None
+            f.seek(i * ENTRY.size)
+            return ENTRY.unpack(f.read(ENTRY.size))[0]
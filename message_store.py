@@ -0,0 +1,858 @@
+#!/usr/bin/env python3
+"""
+Message Store - Storage used by the bridge and both interfaces
+MessageStore is the interface every backend implements. The default backend
+keeps each direction in an append-only JSON Lines log, so sending a message
+costs one small append instead of rewriting the whole conversation.
+"""
+
+import glob
+import gzip
+import heapq
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from file_watcher import watch
+from log_index import LogIndex, epoch_seconds
+
+try:
+    import fcntl
+except ImportError:  # Windows - appends are still single writes
+    fcntl = None
+
+INBOX_FILE = "assistant_inbox.jsonl"
+OUTBOX_FILE = "assistant_outbox.jsonl"
+
+# Old whole-file JSON arrays, migrated into the logs on first access
+LEGACY_INBOX_FILE = "assistant_inbox.json"
+LEGACY_OUTBOX_FILE = "assistant_outbox.json"
+
+BOXES = {
+    'inbox': (INBOX_FILE, LEGACY_INBOX_FILE),
+    'outbox': (OUTBOX_FILE, LEGACY_OUTBOX_FILE),
+}
+
+# Environment variable selecting the backend for every process (jsonl/sqlite/socket)
+BACKEND_ENV = "ASSISTANT_STORE"
+
+# How far back from the end of the file to look for the last record
+TAIL_CHUNK = 4096
+
+# The active log file is sealed into a segment once it is this large or old
+SEGMENT_SIZE = 4 * 1024 * 1024
+SEGMENT_AGE = 24 * 60 * 60
+
+# <stem>.<first seq>-<last seq>.jsonl, plus .gz once archived
+SEGMENT_PATTERN = re.compile(r"\.(\d+)-(\d+)\.jsonl(\.gz)?")
+
+
+class MessageLog:
+    """
+    Append-only JSON Lines log of messages for one direction (inbox/outbox)
+
+    Only the active file (path) is written. Past segment_size bytes or
+    segment_age seconds it is sealed into a segment next to it, named after
+    the sequence numbers it holds (assistant_inbox.000000000001-000000000812.jsonl),
+    and a fresh active file is started. Segments every consumer has read are
+    compressed into .jsonl.gz archives; both stay readable.
+    """
+
+    def __init__(self, path, legacy_path=None, segment_size=SEGMENT_SIZE, segment_age=SEGMENT_AGE):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.segment_size = segment_size
+        self.segment_age = segment_age
+        self._stem = os.path.splitext(path)[0]
+        self._last_seq = 0
+        # (inode, size) of the active file when _last_seq was its last record
+        self._known = (None, -1)
+        # flock() serializes processes; this serializes threads sharing the log
+        self._thread_lock = threading.RLock()
+        # (inode, seq, offset) just past the last record read, to resume tail reads
+        self._read_hint = (None, 0, 0)
+        # (generation, seq, epoch seconds) of the active file's first record
+        self._first = (None, None, None)
+        # (generation when listed, segments)
+        self._segment_cache = (None, [])
+        self.index = LogIndex(path)
+
+    def append(self, sender, message, **fields):
+        """Append one message and return the stored record"""
+        return self.append_many([dict(fields, sender=sender, message=message)])[0]
+
+    def append_many(self, messages):
+        """
+        Append several messages with a single write and flush
+
+        Each message is a dict with sender, message and any extra fields.
+        Returns the stored records.
+        """
+        self._migrate()
+
+        records = []
+        for msg in messages:
+            record = {
+                "seq": 0,
+                "timestamp": datetime.now().isoformat(),
+                "sender": msg.get("sender", ""),
+                "message": msg.get("message", ""),
+            }
+            record.update(msg)
+            records.append(record)
+        if not records:
+            return records
+
+        rolled = False
+        with self._thread_lock:
+            f = self._open_active()
+            try:
+                seq = self._tail_seq(f)
+                lines = []
+                for record in records:
+                    seq += 1
+                    record["seq"] = seq
+                    lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+                f.write("".join(lines).encode('utf-8'))
+                f.flush()
+                self._remember_tail(f, seq)
+                if self._should_roll(f):
+                    self._roll(f, seq)
+                    rolled = True
+            finally:
+                self._unlock(f)
+                f.close()
+
+        if rolled:
+            threading.Thread(target=self.compact, daemon=True).start()
+        return records
+
+    def read_all(self):
+        """Return every record in the log, oldest first"""
+        records, _, _, first = self._read_active(0)
+        return self._older(0, first) + records
+
+    def read_from(self, offset):
+        """
+        Read complete records of the active file starting at a byte offset
+
+        Returns (records, next_offset). A partially written last line is left
+        for the next call.
+        """
+        records, offset, _, _ = self._read_active(offset)
+        return records, offset
+
+    def read_after(self, seq):
+        """Records with a sequence number greater than seq"""
+        ino = self._inode()
+        hint_ino, hint_seq, hint_offset = self._read_hint
+        if hint_ino != ino or hint_seq > seq or hint_offset > self._size():
+            hint_seq, hint_offset = 0, 0
+        if seq > hint_seq and ino is not None:
+            # Far behind the hint: seek with the index instead of scanning
+            self.index.update()
+            offset = self.index.offset_of(seq + 1)
+            if offset is not None and offset > hint_offset:
+                hint_offset = offset
+
+        records, offset, active, first = self._read_active(hint_offset)
+        if active != ino:
+            # Rolled over meanwhile - the offset was for the old file
+            records, offset, active, first = self._read_active(0)
+        if records:
+            self._read_hint = (active, records[-1].get("seq", 0), offset)
+
+        records = [r for r in records if r.get("seq", 0) > seq]
+        if first is None or seq < first - 1:
+            records = self._older(seq, first) + records
+        return records
+
+    def read_before(self, seq, limit):
+        """Up to limit records with a sequence number below seq, oldest first"""
+        self._migrate()
+        if limit <= 0 or not os.path.exists(self.path):
+            return []
+
+        self.index.update()
+        offset, count = self.index.locate(seq, limit)
+        records = []
+        with open(self.path, 'rb') as f:
+            first = self._first_record(f)[0]
+            f.seek(offset)
+            while len(records) < count:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("seq", 0) < seq:
+                    records.append(record)
+
+        if len(records) < limit:
+            below = min(seq, records[0]["seq"] if records else first or seq)
+            records = self._older_tail(below, limit - len(records)) + records
+        return records
+
+    def seq_at(self, timestamp):
+        """First sequence number at or after an ISO timestamp (None if all are older)"""
+        self._migrate()
+        moment = epoch_seconds(timestamp, None)
+        if moment is None:
+            raise ValueError(f"Invalid timestamp: {timestamp!r}")
+        found = first = None
+        if os.path.exists(self.path):
+            self.index.update()
+            found = self.index.seq_at(timestamp)
+            with open(self.path, 'rb') as f:
+                first = self._first_record(f)[0]
+        if first is not None and found != first:
+            return found
+
+        # Before the active file: look back through the segments
+        for _, last, path in reversed(self.segments()):
+            records = [r for r in self._read_segment(path) if first is None or r.get("seq", 0) < first]
+            later = [r for r in records if epoch_seconds(r.get("timestamp"), 0) >= moment]
+            if not later:
+                break
+            found = later[0]["seq"]
+            if len(later) < len(records):
+                break
+        return found
+
+    def tail(self, n):
+        """Return the last n records without reading the whole log"""
+        if n <= 0:
+            return []
+        records = []
+        size = self._size()
+        if size:
+            with open(self.path, 'rb') as f:
+                start = size
+                data = b""
+                while start > 0 and data.count(b"\n") <= n:
+                    start = max(0, start - TAIL_CHUNK * 4)
+                    f.seek(start)
+                    data = f.read(size - start)
+
+            lines = data.splitlines()
+            if start > 0:
+                lines = lines[1:]  # first line may be cut in half
+            if not data.endswith(b"\n"):
+                lines = lines[:-1]  # still being written
+
+            for line in lines[-n:]:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+
+        if len(records) < n:
+            below = records[0].get("seq", 0) if records else None
+            records = self._older_tail(below, n - len(records)) + records
+        return records
+
+    def read_new(self, consumer):
+        """
+        Return records the consumer has not seen yet and advance its cursor
+
+        Only the tail past the cursor is read; acknowledging costs one tiny
+        cursor write, the log itself is never touched.
+        """
+        with self._thread_lock:
+            cursor = self.cursor(consumer)
+            ino = self._inode()
+            offset = cursor.offset
+            if cursor.inode != ino or offset > self._size():
+                # Log rolled over, was replaced, or the cursor predates
+                # segments - find the place by sequence number
+                offset = 0
+                if ino is not None and cursor.seq:
+                    self.index.update()
+                    offset = self.index.offset_of(cursor.seq + 1) or 0
+
+            records, offset, active, first = self._read_active(offset)
+            if active != ino:
+                records, offset, active, first = self._read_active(0)
+            records = [r for r in records if r.get("seq", 0) > cursor.seq]
+            if first is None or cursor.seq < first - 1:
+                # Fell behind by more than the active file holds
+                records = self._older(cursor.seq, first) + records
+            if records:
+                cursor.save(records[-1]["seq"], offset, active)
+            return records
+
+    def acknowledge(self, consumer, seq):
+        """Move a consumer's cursor forward to seq (never backwards)"""
+        with self._thread_lock:
+            cursor = self.cursor(consumer)
+            if seq <= cursor.seq:
+                return
+            ino = self._inode()
+            self.index.update()
+            # Start of the next record; read_new() skips anything up to seq anyway
+            offset = self.index.offset_of(seq + 1)
+            cursor.save(seq, offset if offset is not None else 0, ino)
+
+    def cursor(self, consumer):
+        """Persistent read position of one consumer of this log"""
+        cursor = ReadCursor(f"{self._stem}.{consumer}.cursor")
+        if not cursor.exists():
+            cursor.save(*self._legacy_read_position(), self._inode())
+        return cursor
+
+    def segments(self):
+        """Sealed segments as (first_seq, last_seq, path), oldest first"""
+        generation = self._generation()
+        if generation != self._segment_cache[0]:
+            found = {}
+            for path in glob.glob(glob.escape(self._stem) + ".*-*.jsonl*"):
+                match = SEGMENT_PATTERN.fullmatch(path[len(self._stem):])
+                if not match:
+                    continue
+                key = (int(match.group(1)), int(match.group(2)))
+                if match.group(3) is None or key not in found:
+                    found[key] = path  # prefer the plain file while both exist
+            self._segment_cache = (generation, [(first, last, path)
+                                         for (first, last), path in sorted(found.items())])
+        return self._segment_cache[1]
+
+    def compact(self):
+        """
+        Compress sealed segments that every consumer has read past
+
+        Archives stay readable by the history and read methods. Returns the
+        number of segments archived.
+        """
+        consumed = self._consumed_seq()
+        archived = 0
+        for _, last, path in self.segments():
+            if path.endswith(".gz") or last > consumed:
+                continue
+            archive = path + ".gz"
+            tmp = f"{archive}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(path, 'rb') as src, gzip.open(tmp, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.replace(tmp, archive)
+                os.remove(path)
+                archived += 1
+            except FileNotFoundError:
+                # Another process archived it first
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        return archived
+
+    def _consumed_seq(self):
+        """Lowest sequence number every consumer with a cursor has read"""
+        seqs = [ReadCursor(path).seq for path in glob.glob(glob.escape(self._stem) + ".*.cursor")]
+        return min(seqs) if seqs else float("inf")
+
+    def _older(self, after, below):
+        """Records from the segments with after < seq < below (None: no upper bound)"""
+        records = []
+        for first, last, path in self.segments():
+            if last <= after or (below is not None and first >= below):
+                continue
+            records += [r for r in self._read_segment(path)
+                        if after < r.get("seq", 0) and (below is None or r["seq"] < below)]
+        return records
+
+    def _older_tail(self, below, n):
+        """The newest n records from the segments with seq < below, oldest first"""
+        records = []
+        for first, _, path in reversed(self.segments()):
+            if len(records) >= n:
+                break
+            if below is not None and first >= below:
+                continue
+            records = [r for r in self._read_segment(path)
+                       if below is None or r.get("seq", 0) < below] + records
+        return records[-n:]
+
+    def _read_segment(self, path):
+        """Every record of a sealed segment, plain or archived"""
+        candidates = [path] if path.endswith(".gz") else [path, path + ".gz"]
+        for candidate in candidates:
+            opener = gzip.open if candidate.endswith(".gz") else open
+            try:
+                with opener(candidate, 'rb') as f:
+                    return self._parse(f.read())
+            except FileNotFoundError:
+                continue  # archived since it was listed
+        return []
+
+    def _read_active(self, offset):
+        """
+        Complete records of the active file from a byte offset
+
+        Returns (records, next_offset, inode, first_seq); inode and
+        first_seq are None when the file is missing or empty.
+        """
+        self._migrate()
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return [], offset, None, None
+        with f:
+            ino = os.fstat(f.fileno()).st_ino
+            first = self._first_record(f)[0]
+            f.seek(offset)
+            data = f.read()
+
+        end = data.rfind(b"\n") + 1
+        return self._parse(data[:end]), offset + end, ino, first
+
+    def _first_record(self, f):
+        """(seq, epoch seconds) of the first record in the open active file"""
+        generation = self._generation(f)
+        if self._first[0] != generation or self._first[1] is None:
+            f.seek(0)
+            line = f.readline()
+            try:
+                record = json.loads(line) if line.endswith(b"\n") else None
+            except json.JSONDecodeError:
+                record = None
+            if record is None:
+                return None, None
+            self._first = (generation, record.get("seq", 0),
+                           epoch_seconds(record.get("timestamp"), time.time()))
+        return self._first[1], self._first[2]
+
+    def _parse(self, data):
+        records = []
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"Skipping corrupt record in {self.path}")
+        return records
+
+    def _open_active(self):
+        """Open the active file for appending, locked; retries if it rolls over meanwhile"""
+        while True:
+            f = open(self.path, 'ab')
+            self._lock(f)
+            try:
+                if os.stat(self.path).st_ino == os.fstat(f.fileno()).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            self._unlock(f)
+            f.close()
+
+    def _should_roll(self, f):
+        size = os.fstat(f.fileno()).st_size
+        if self.segment_size and size >= self.segment_size:
+            return True
+        if self.segment_age:
+            started = self._first_record(f)[1]
+            return started is not None and time.time() - started >= self.segment_age
+        return False
+
+    def _roll(self, f, last_seq):
+        """Seal the active file as a segment and start an empty one (lock held)"""
+        first = self._first_record(f)[0] or last_seq
+        sealed = f"{self._stem}.{first:012d}-{last_seq:012d}.jsonl"
+        try:
+            # Readers find the records under one name or the other, never neither
+            os.link(self.path, sealed)
+        except OSError:
+            # No hard links here; the next append creates the active file
+            os.replace(self.path, sealed)
+        else:
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            open(tmp, 'wb').close()
+            os.replace(tmp, self.path)
+        self._known = (None, -1)
+
+    def _legacy_read_position(self):
+        """Position after the leading records flagged read by older versions"""
+        seq, offset = 0, 0
+        if not os.path.exists(self.path):
+            return seq, offset
+
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if not record.get("read", False):
+                    break
+                seq = record.get("seq", seq)
+                offset += len(line)
+        return seq, offset
+
+    def _generation(self, f=None):
+        """
+        Changes whenever the active file is replaced or a segment is added or archived
+
+        Inode numbers alone are not enough, they are reused once an archived
+        segment is deleted.
+        """
+        try:
+            ino = os.fstat(f.fileno()).st_ino if f else os.stat(self.path).st_ino
+            return ino, os.stat(os.path.dirname(self.path) or ".").st_mtime_ns
+        except OSError:
+            return None
+
+    def _inode(self):
+        try:
+            return os.stat(self.path).st_ino
+        except OSError:
+            return None
+
+    def _size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _migrate(self):
+        """Import a legacy JSON array file into the log, then set it aside"""
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+
+        # Claim the file first so concurrent processes don't import it twice
+        migrated = self.legacy_path + ".migrated"
+        try:
+            os.replace(self.legacy_path, migrated)
+            with open(migrated, 'r', encoding='utf-8') as f:
+                messages = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError, PermissionError):
+            return
+
+        legacy_path, self.legacy_path = self.legacy_path, None
+        try:
+            for msg in messages:
+                fields = {k: v for k, v in msg.items() if k not in ('sender', 'message', 'seq')}
+                self.append(msg.get('sender', ''), msg.get('message', ''), **fields)
+        finally:
+            self.legacy_path = legacy_path
+
+    def _tail_seq(self, f):
+        """Sequence number of the last record (file must be locked)"""
+        st = os.fstat(f.fileno())
+        if (st.st_ino, st.st_size) == self._known:
+            return self._last_seq
+        if st.st_size == 0:
+            # Just rolled over: numbering continues from the newest segment
+            segments = self.segments()
+            return segments[-1][1] if segments else 0
+
+        with open(self.path, 'rb') as r:
+            start = max(0, size - TAIL_CHUNK)
+            while True:
+                r.seek(start)
+                chunk = r.read(size - start)
+                lines = [l for l in chunk.splitlines() if l.strip()]
+                if len(lines) > 1 or start == 0:
+                    break
+                start = max(0, start - TAIL_CHUNK)
+
+        for line in reversed(lines):
+            try:
+                return json.loads(line).get("seq", 0)
+            except json.JSONDecodeError:
+                continue
+        return 0
+
+    def _remember_tail(self, f, seq):
+        st = os.fstat(f.fileno())
+        self._last_seq = seq
+        self._known = (st.st_ino, st.st_size)
+
+    @staticmethod
+    def _lock(f):
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    @staticmethod
+    def _unlock(f):
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class ReadCursor:
+    """Last sequence number and byte offset a consumer has read, kept in a small file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.seq = 0
+        self.offset = 0
+        # Active log file the offset belongs to; it changes at every rollover
+        self.inode = None
+        self._load()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def save(self, seq, offset, inode=None):
+        """Persist the new position atomically"""
+        self.seq, self.offset, self.inode = seq, offset, inode
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({"seq": seq, "offset": offset, "inode": inode}, f)
+        os.replace(tmp, self.path)
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self.seq = data.get("seq", 0)
+            self.offset = data.get("offset", 0)
+            self.inode = data.get("inode")
+        except (json.JSONDecodeError, FileNotFoundError, PermissionError):
+            pass
+
+
+def open_log(box, directory=".", **options):
+    """Open the inbox or outbox log in the given directory (options: segment_size/segment_age)"""
+    path, legacy = BOXES[box]
+    return MessageLog(os.path.join(directory, path), os.path.join(directory, legacy), **options)
+
+
+class MessageStore:
+    """
+    Interface for message storage backends
+
+    A store holds two boxes: 'inbox' (user -> assistant) and 'outbox'
+    (assistant -> user). Records are dicts with at least seq, timestamp,
+    sender and message; seq increases by one per box.
+    """
+
+    def append(self, box, sender, message, **fields):
+        """Store one message and return the record"""
+        raise NotImplementedError
+
+    def append_many(self, box, messages):
+        """
+        Store several messages at once and return their records
+
+        Each message is a dict with sender, message and any extra fields.
+        """
+        records = []
+        for msg in messages:
+            fields = {k: v for k, v in msg.items() if k not in ('sender', 'message')}
+            records.append(self.append(box, msg.get('sender', ''), msg.get('message', ''), **fields))
+        return records
+
+    def read_all(self, box):
+        """Every record in the box, oldest first"""
+        raise NotImplementedError
+
+    def read_after(self, box, seq):
+        """Records with a sequence number greater than seq"""
+        raise NotImplementedError
+
+    def last(self, box, n):
+        """The newest n records, oldest first"""
+        raise NotImplementedError
+
+    def read_new(self, box, consumer):
+        """Records the consumer has not seen yet; advances its cursor"""
+        raise NotImplementedError
+
+    def get_cursor(self, box, consumer):
+        """Sequence number of the last record the consumer has acknowledged"""
+        raise NotImplementedError
+
+    def set_cursor(self, box, consumer, seq):
+        """Acknowledge everything up to seq for a consumer (never moves back)"""
+        raise NotImplementedError
+
+    def watch(self, *boxes):
+        """Watcher (see file_watcher) that wakes up when any of the boxes changes"""
+        raise NotImplementedError
+
+    def read_before(self, box, seq, limit):
+        """Up to limit records with a sequence number below seq, oldest first"""
+        if limit <= 0:
+            return []
+        return [r for r in self.read_all(box) if r.get("seq", 0) < seq][-limit:]
+
+    def position_at(self, timestamp):
+        """
+        Per box, the first sequence number at or after an ISO timestamp
+
+        The result can be passed to history() as `before`.
+        """
+        position = {}
+        for box, seq in self.head().items():
+            later = [r for r in self.read_all(box) if r.get("timestamp", "") >= timestamp]
+            position[box] = later[0]["seq"] if later else seq + 1
+        return position
+
+    def history(self, before=None, limit=50):
+        """
+        One page of the conversation older than a position, merged by timestamp
+
+        before holds, per box, the first sequence number not to return; None
+        starts at the newest message. Returns (records, next_before) where the
+        records are tagged with their box and next_before is None once the
+        start of the conversation has been reached.
+        """
+        if limit <= 0:
+            raise ValueError(f"Invalid page size: {limit}")
+        if before is None:
+            before = {box: seq + 1 for box, seq in self.head().items()}
+
+        streams = {box: [dict(r, box=box) for r in self.read_before(box, before.get(box, 0), limit)]
+                   for box in BOXES}
+        messages = list(heapq.merge(*streams.values(), key=lambda x: x.get('timestamp', '')))
+        messages = messages[-limit:]
+
+        next_before = dict(before)
+        for msg in messages:
+            next_before[msg['box']] = min(next_before[msg['box']], msg['seq'])
+        # A box may have more if the page was full or some of it was left out
+        more = any(len(records) == limit or
+                   (records and records[0]['seq'] < next_before[box])
+                   for box, records in streams.items())
+        return messages, next_before if more else None
+
+    def timeline(self):
+        """Full conversation (inbox and outbox merged), ordered by timestamp"""
+        return self.read_since(start_position())[0]
+
+    def version(self):
+        """Cheap token that changes whenever the stored messages change"""
+        return format_position(self.head())
+
+    def head(self):
+        """Position of the newest message in every box"""
+        return {box: (self.last(box, 1) or [{"seq": 0}])[0].get("seq", 0) for box in BOXES}
+
+    def read_since(self, position):
+        """
+        Records of both boxes newer than a position, merged by timestamp
+
+        Each record is tagged with its box. Returns (records, new_position).
+        """
+        streams = []
+        position = dict(position)
+        for box in BOXES:
+            records = self.read_after(box, position.get(box, 0))
+            if records:
+                position[box] = records[-1]["seq"]
+            streams.append([dict(r, box=box) for r in records])
+
+        # Each box is already in time order, so merging is enough
+        messages = list(heapq.merge(*streams, key=lambda x: x.get('timestamp', '')))
+        return messages, position
+
+    def close(self):
+        pass
+
+
+class JsonlStore(MessageStore):
+    """Default backend: one append-only MessageLog per box"""
+
+    def __init__(self, directory=".", **options):
+        self.directory = directory
+        self.logs = {box: open_log(box, directory, **options) for box in BOXES}
+
+    def append(self, box, sender, message, **fields):
+        return self.logs[box].append(sender, message, **fields)
+
+    def append_many(self, box, messages):
+        return self.logs[box].append_many(messages)
+
+    def read_all(self, box):
+        return self.logs[box].read_all()
+
+    def read_after(self, box, seq):
+        return self.logs[box].read_after(seq)
+
+    def last(self, box, n):
+        return self.logs[box].tail(n)
+
+    def version(self):
+        # Logs only grow, so inode, size and mtime identify their content
+        result = []
+        for log in self.logs.values():
+            try:
+                st = os.stat(log.path)
+                result.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except OSError:
+                result.append(None)
+        return tuple(result)
+
+    def read_new(self, box, consumer):
+        return self.logs[box].read_new(consumer)
+
+    def get_cursor(self, box, consumer):
+        return self.logs[box].cursor(consumer).seq
+
+    def set_cursor(self, box, consumer, seq):
+        self.logs[box].acknowledge(consumer, seq)
+
+    def read_before(self, box, seq, limit):
+        return self.logs[box].read_before(seq, limit)
+
+    def position_at(self, timestamp):
+        position = {}
+        for box, seq in self.head().items():
+            found = self.logs[box].seq_at(timestamp)
+            position[box] = seq + 1 if found is None else found
+        return position
+
+    def watch(self, *boxes):
+        paths = []
+        for box in boxes or BOXES:
+            paths += [self.logs[box].path, self.logs[box].legacy_path]
+        return watch(paths)
+
+
+def start_position():
+    """Position before the first message of every box"""
+    return {box: 0 for box in BOXES}
+
+
+def format_position(position):
+    """Encode a position as a compact token, e.g. '12-7' (inbox-outbox)"""
+    return "-".join(str(position.get(box, 0)) for box in BOXES)
+
+
+def parse_position(token):
+    """Decode a token from format_position(); raises ValueError if malformed"""
+    parts = [int(p) for p in token.split("-")]
+    if len(parts) != len(BOXES) or min(parts) < 0:
+        raise ValueError(f"Invalid position: {token!r}")
+    return dict(zip(BOXES, parts))
+
+
+def parse_before(store, token):
+    """Decode a history() page boundary: a position token or an ISO timestamp"""
+    if 'T' in token or ':' in token:
+        return store.position_at(token)
+    return parse_position(token)
+
+
+def open_store(backend=None, directory="."):
+    """
+    Open the configured message store
+
+    The backend defaults to the ASSISTANT_STORE environment variable so the
+    GUI, web server and assistant all agree on where messages live.
+    """
+    backend = backend or os.environ.get(BACKEND_ENV, "jsonl")
+    if backend == "jsonl":
+        return JsonlStore(directory)
+    if backend == "sqlite":
+        from sqlite_store import SQLiteStore
+        return SQLiteStore(directory)
+    if backend == "socket":
+        from socket_transport import BrokerStore
+        return BrokerStore()
+    raise ValueError(f"Unknown message store backend: {backend}")
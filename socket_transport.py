@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Socket Transport - Local message broker over a Unix domain socket
+The interfaces and the assistant connect to one broker process that pushes
+new messages to subscribers as soon as they are sent; no files are polled.
+Writing to a durable store is an optional side channel off the hot path.
+
+Start the broker:   python3 socket_transport.py [jsonl|sqlite|none]
+Use it everywhere:  ASSISTANT_STORE=socket python3 example_assistant.py
+"""
+
+import bisect
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import sys
+import threading
+from datetime import datetime
+
+from message_store import MessageStore, BOXES, open_store
+
+SOCKET_FILE = "assistant.sock"
+SOCKET_ENV = "ASSISTANT_SOCKET"
+
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME = 16 * 1024 * 1024
+
+
+def send_frame(sock, payload):
+    """Write one length-prefixed JSON frame"""
+    data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    sock.sendall(FRAME_HEADER.pack(len(data)) + data)
+
+
+def recv_frame(sock):
+    """Read one frame; returns None when the peer has closed the connection"""
+    header = _recv_exactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME:
+        raise ValueError(f"Frame too large: {length} bytes")
+    data = _recv_exactly(sock, length)
+    if data is None:
+        return None
+    return json.loads(data.decode('utf-8'))
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def socket_path():
+    return os.environ.get(SOCKET_ENV, SOCKET_FILE)
+
+
+class MessageBroker(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Keeps the conversation in memory and pushes appends to subscribers
+
+    If a durable store is given, history is loaded from it at startup and
+    every message is written to it by a background thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path=None, store=None):
+        self.path = path or socket_path()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        super().__init__(self.path, BrokerConnection)
+
+        self.store = store
+        self.lock = threading.Lock()
+        self.history = {box: [] for box in BOXES}
+        self.cursors = {}
+        self.subscribers = {box: {} for box in BOXES}
+        self.watchers = {box: set() for box in BOXES}
+
+        if store is not None:
+            for box in BOXES:
+                self.history[box] = store.read_all(box)
+        self._log_queue = queue.Queue()
+        threading.Thread(target=self._write_log, daemon=True).start()
+
+    def append(self, box, sender, message, fields):
+        return self.append_many(box, [dict(fields, sender=sender, message=message)])[0]
+
+    def append_many(self, box, messages):
+        """Store messages and push them to subscribers as one frame"""
+        with self.lock:
+            records = []
+            seq = self._last_seq(box)
+            for msg in messages:
+                record = {
+                    "seq": 0,
+                    "timestamp": datetime.now().isoformat(),
+                    "sender": msg.get("sender", ""),
+                    "message": msg.get("message", ""),
+                }
+                record.update(msg)
+                seq += 1
+                record["seq"] = seq
+                records.append(record)
+            if not records:
+                return records
+            self.history[box].extend(records)
+
+            # Pushed under the lock so every subscriber sees the same order
+            delivered = []
+            for consumer, conn in list(self.subscribers[box].items()):
+                if conn.push(box, records):
+                    self.cursors[(box, consumer)] = seq
+                    delivered.append(consumer)
+            for conn in list(self.watchers[box]):
+                conn.notify(box)
+
+        self._log_queue.put(("append", box, records, delivered))
+        return records
+
+    def get_cursor(self, box, consumer):
+        with self.lock:
+            if (box, consumer) not in self.cursors and self.store is not None:
+                return self.store.get_cursor(box, consumer)
+            return self.cursors.get((box, consumer), 0)
+
+    def set_cursor(self, box, consumer, seq):
+        with self.lock:
+            current = self.cursors.get((box, consumer))
+            if current is None and self.store is not None:
+                current = self.store.get_cursor(box, consumer)
+            self.cursors[(box, consumer)] = max(current or 0, seq)
+        self._log_queue.put(("ack", box, consumer, seq))
+
+    def subscribe(self, box, consumer, conn):
+        """Register a consumer and return what it has missed"""
+        with self.lock:
+            if (box, consumer) not in self.cursors and self.store is not None:
+                pending = self.store.read_new(box, consumer)
+                seq = pending[0]["seq"] - 1 if pending else self._last_seq(box)
+                self.cursors[(box, consumer)] = seq
+            seq = self.cursors.get((box, consumer), 0)
+            missed = [r for r in self.history[box] if r["seq"] > seq]
+            if missed:
+                self.cursors[(box, consumer)] = missed[-1]["seq"]
+            self.subscribers[box][consumer] = conn
+            return missed
+
+    def add_watcher(self, box, conn):
+        """Send change notifications (without the messages) to a connection"""
+        with self.lock:
+            self.watchers[box].add(conn)
+
+    def unsubscribe(self, conn):
+        with self.lock:
+            for watchers in self.watchers.values():
+                watchers.discard(conn)
+            for subscribers in self.subscribers.values():
+                for consumer, other in list(subscribers.items()):
+                    if other is conn:
+                        del subscribers[consumer]
+
+    def read_after(self, box, seq):
+        with self.lock:
+            return [r for r in self.history[box] if r["seq"] > seq]
+
+    def read_before(self, box, seq, limit):
+        """Newest records below seq (None: the newest of all), oldest first"""
+        if limit <= 0:
+            return []
+        with self.lock:
+            history = self.history[box]
+            if seq is not None:
+                history = history[:bisect.bisect_left(history, seq, key=lambda r: r["seq"])]
+            return history[-limit:]
+
+    def _last_seq(self, box):
+        return self.history[box][-1]["seq"] if self.history[box] else 0
+
+    def _write_log(self):
+        """Durable side channel: mirror messages and delivery into the store"""
+        while True:
+            # Everything queued meanwhile is written together
+            items = [self._log_queue.get()]
+            while not self._log_queue.empty():
+                items.append(self._log_queue.get())
+            if self.store is None:
+                continue
+            try:
+                self._write_items(items)
+            except Exception as e:
+                print(f"Broker log error: {e}")
+
+    def _write_items(self, items):
+        batch, box, delivered = [], None, set()
+        for item in items + [("end", None)]:
+            if item[0] != "append" or item[1] != box:
+                if batch:
+                    self.store.append_many(box, batch)
+                    for consumer in delivered:
+                        self.store.read_new(box, consumer)
+                batch, box, delivered = [], item[1], set()
+            if item[0] == "append":
+                _, box, records, consumers = item
+                batch += [{k: v for k, v in r.items() if k != 'seq'} for r in records]
+                delivered.update(consumers)
+            elif item[0] == "ack":
+                _, ack_box, consumer, seq = item
+                self.store.set_cursor(ack_box, consumer, seq)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BrokerConnection(socketserver.BaseRequestHandler):
+    """One connected client; frames are handled in order"""
+
+    def setup(self):
+        self.send_lock = threading.Lock()
+
+    def push(self, box, records):
+        try:
+            with self.send_lock:
+                send_frame(self.request, {"op": "messages", "box": box, "records": records})
+            return True
+        except OSError:
+            return False
+
+    def notify(self, box):
+        try:
+            with self.send_lock:
+                send_frame(self.request, {"op": "changed", "box": box})
+        except OSError:
+            pass
+
+    def reply(self, request, **payload):
+        payload["id"] = request.get("id")
+        with self.send_lock:
+            send_frame(self.request, payload)
+
+    def handle(self):
+        broker = self.server
+        try:
+            while True:
+                request = recv_frame(self.request)
+                if request is None:
+                    break
+                op = request.get("op")
+                box = request.get("box")
+                if box not in BOXES:
+                    self.reply(request, error=f"unknown box {box!r}")
+                elif op == "append":
+                    record = broker.append(box, request.get("sender", ""),
+                                           request.get("message", ""), request.get("fields") or {})
+                    self.reply(request, record=record)
+                elif op == "append_many":
+                    self.reply(request, records=broker.append_many(box, request.get("messages") or []))
+                elif op == "cursor":
+                    self.reply(request, seq=broker.get_cursor(box, request["consumer"]))
+                elif op == "ack":
+                    broker.set_cursor(box, request["consumer"], request.get("seq", 0))
+                    self.reply(request)
+                elif op == "subscribe":
+                    missed = broker.subscribe(box, request["consumer"], self)
+                    self.reply(request, records=missed)
+                elif op == "watch":
+                    broker.add_watcher(box, self)
+                    self.reply(request)
+                elif op == "read":
+                    self.reply(request, records=broker.read_after(box, request.get("after", 0)))
+                elif op == "page":
+                    self.reply(request, records=broker.read_before(box, request.get("before"),
+                                                                   request.get("limit", 0)))
+                else:
+                    self.reply(request, error=f"unknown op {op!r}")
+        except (OSError, ValueError) as e:
+            print(f"Broker connection error: {e}")
+        finally:
+            broker.unsubscribe(self)
+
+
+class QueueWatcher:
+    """Watcher for pushed messages, same interface as file_watcher's watchers"""
+
+    def __init__(self, event, on_close=None):
+        self.event = event
+        self._on_close = on_close
+
+    def wait(self, timeout=None):
+        changed = self.event.wait(timeout)
+        self.event.clear()
+        return changed
+
+    def close(self):
+        if self._on_close:
+            self._on_close(self.event)
+            self._on_close = None
+
+
+class BrokerStore(MessageStore):
+    """MessageStore that talks to a MessageBroker instead of touching files"""
+
+    def __init__(self, path=None):
+        self.path = path or socket_path()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+        self._send_lock = threading.Lock()
+        self._next_id = 0
+        self._replies = {}
+        self._pushed = {box: [] for box in BOXES}
+        self._subscribed = {}
+        self._watching = set()
+        self._events = {box: [] for box in BOXES}
+        self._lock = threading.Condition()
+
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def _request(self, op, box, **payload):
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+        payload.update(op=op, box=box, id=request_id)
+        with self._send_lock:
+            send_frame(self.sock, payload)
+
+        with self._lock:
+            while request_id not in self._replies:
+                if not self._reader.is_alive():
+                    raise ConnectionError("Broker connection closed")
+                self._lock.wait(1.0)
+            reply = self._replies.pop(request_id)
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    def _read_loop(self):
+        try:
+            while True:
+                frame = recv_frame(self.sock)
+                if frame is None:
+                    break
+                with self._lock:
+                    if frame.get("op") in ("messages", "changed"):
+                        box = frame["box"]
+                        if frame["op"] == "messages":
+                            self._pushed[box].extend(frame["records"])
+                        for event in self._events[box]:
+                            event.set()
+                    else:
+                        self._replies[frame.get("id")] = frame
+                    self._lock.notify_all()
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                self._lock.notify_all()
+
+    def append(self, box, sender, message, **fields):
+        return self._request("append", box, sender=sender, message=message, fields=fields)["record"]
+
+    def append_many(self, box, messages):
+        return self._request("append_many", box, messages=list(messages))["records"]
+
+    def get_cursor(self, box, consumer):
+        return self._request("cursor", box, consumer=consumer)["seq"]
+
+    def set_cursor(self, box, consumer, seq):
+        self._request("ack", box, consumer=consumer, seq=seq)
+
+    def read_all(self, box):
+        return self.read_after(box, 0)
+
+    def read_after(self, box, seq):
+        return self._request("read", box, after=seq)["records"]
+
+    def read_before(self, box, seq, limit):
+        return self._request("page", box, before=seq, limit=limit)["records"]
+
+    def last(self, box, n):
+        return self._request("page", box, before=None, limit=n)["records"]
+
+    def read_new(self, box, consumer):
+        if self._subscribed.get(box) not in (None, consumer):
+            raise ValueError(f"This connection already consumes {box} as {self._subscribed[box]}")
+        if box not in self._subscribed:
+            self._subscribed[box] = consumer
+            missed = self._request("subscribe", box, consumer=consumer)["records"]
+        else:
+            missed = []
+
+        with self._lock:
+            pushed, self._pushed[box] = self._pushed[box], []
+        return missed + pushed
+
+    def watch(self, *boxes):
+        event = threading.Event()
+        for box in boxes or BOXES:
+            if box not in self._subscribed and box not in self._watching:
+                # Not consuming this box - ask for change notifications only
+                self._watching.add(box)
+                self._request("watch", box)
+            with self._lock:
+                self._events[box].append(event)
+                if self._pushed[box]:
+                    event.set()
+        return QueueWatcher(event, self._forget_event)
+
+    def _forget_event(self, event):
+        with self._lock:
+            for events in self._events.values():
+                if event in events:
+                    events.remove(event)
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def main():
+    backend = sys.argv[1] if len(sys.argv) > 1 else "jsonl"
+    store = None if backend == "none" else open_store(backend)
+    broker = MessageBroker(store=store)
+
+    print("=" * 50)
+    print("ASSISTANT MESSAGE BROKER")
+    print("=" * 50)
+    print(f"\nListening on {broker.path} (durable log: {backend})")
+    print(f"Start the other programs with {SOCKET_ENV}={broker.path} ASSISTANT_STORE=socket")
+    print("\nPritisnite Ctrl+C za izlaz\n")
+
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        print("\nBroker zaustavljen")
+    finally:
+        broker.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+SQLite Message Store - Alternative backend using one database in WAL mode
+Readers never block the writer, so the GUI, web server and assistant can all
+use the same conversation at once. Enable with ASSISTANT_STORE=sqlite.
+"""
+
+import glob
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from message_store import MessageStore, JsonlStore, ReadCursor, BOXES
+from file_watcher import watch
+
+DATABASE_FILE = "assistant_messages.db"
+
+CORE_COLUMNS = ("seq", "timestamp", "sender", "message")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    box TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    message TEXT NOT NULL,
+    extra TEXT,
+    PRIMARY KEY (box, seq)
+);
+CREATE INDEX IF NOT EXISTS messages_timestamp ON messages (box, timestamp);
+CREATE INDEX IF NOT EXISTS messages_sender ON messages (sender, box);
+
+-- Delivery state: the last sequence number each consumer has received
+CREATE TABLE IF NOT EXISTS cursors (
+    box TEXT NOT NULL,
+    consumer TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (box, consumer)
+);
+"""
+
+
+class SQLiteStore(MessageStore):
+    """Message store backed by an SQLite database in WAL mode"""
+
+    def __init__(self, directory="."):
+        self.directory = directory
+        self.path = os.path.join(directory, DATABASE_FILE)
+        self._local = threading.local()
+
+        created = not os.path.exists(self.path)
+        db = self._db()
+        db.executescript(SCHEMA)
+        if created:
+            self._import_logs()
+
+    def _db(self):
+        """One connection per thread; sqlite3 connections can't be shared"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def append(self, box, sender, message, **fields):
+        return self.append_many(box, [dict(fields, sender=sender, message=message)])[0]
+
+    def append_many(self, box, messages):
+        records = []
+        for msg in messages:
+            record = {
+                "seq": 0,
+                "timestamp": datetime.now().isoformat(),
+                "sender": msg.get("sender", ""),
+                "message": msg.get("message", ""),
+            }
+            record.update(msg)
+            records.append(record)
+        if not records:
+            return records
+
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM messages WHERE box = ?", (box,)
+            ).fetchone()
+            rows = []
+            for seq, record in enumerate(records, row[0] + 1):
+                record["seq"] = seq
+                extra = {k: v for k, v in record.items() if k not in CORE_COLUMNS}
+                rows.append((box, seq, record["timestamp"], record["sender"], record["message"],
+                             json.dumps(extra, ensure_ascii=False) if extra else None))
+            db.executemany(
+                "INSERT INTO messages (box, seq, timestamp, sender, message, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return records
+
+    def read_all(self, box):
+        return self.read_after(box, 0)
+
+    def read_after(self, box, seq):
+        rows = self._db().execute(
+            "SELECT * FROM messages WHERE box = ? AND seq > ? ORDER BY seq", (box, seq)
+        )
+        return [self._record(row) for row in rows]
+
+    def last(self, box, n):
+        rows = self._db().execute(
+            "SELECT * FROM messages WHERE box = ? ORDER BY seq DESC LIMIT ?", (box, n)
+        ).fetchall()
+        return [self._record(row) for row in reversed(rows)]
+
+    def read_before(self, box, seq, limit):
+        rows = self._db().execute(
+            "SELECT * FROM messages WHERE box = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (box, seq, max(limit, 0))
+        ).fetchall()
+        return [self._record(row) for row in reversed(rows)]
+
+    def position_at(self, timestamp):
+        position = {}
+        for box in BOXES:
+            # messages_timestamp index; seq + 1 past the end when nothing is newer
+            row = self._db().execute(
+                "SELECT MIN(seq), (SELECT COALESCE(MAX(seq), 0) + 1 FROM messages WHERE box = ?) "
+                "FROM messages WHERE box = ? AND timestamp >= ?", (box, box, timestamp)
+            ).fetchone()
+            position[box] = row[0] if row[0] is not None else row[1]
+        return position
+
+    def read_new(self, box, consumer):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT seq FROM cursors WHERE box = ? AND consumer = ?", (box, consumer)
+            ).fetchone()
+            records = self.read_after(box, row["seq"] if row else 0)
+            if records:
+                db.execute(
+                    "INSERT OR REPLACE INTO cursors (box, consumer, seq) VALUES (?, ?, ?)",
+                    (box, consumer, records[-1]["seq"])
+                )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return records
+
+    def get_cursor(self, box, consumer):
+        row = self._db().execute(
+            "SELECT seq FROM cursors WHERE box = ? AND consumer = ?", (box, consumer)
+        ).fetchone()
+        return row["seq"] if row else 0
+
+    def set_cursor(self, box, consumer, seq):
+        self._db().execute(
+            "INSERT INTO cursors (box, consumer, seq) VALUES (?, ?, ?) "
+            "ON CONFLICT (box, consumer) DO UPDATE SET seq = MAX(seq, excluded.seq)",
+            (box, consumer, seq)
+        )
+
+    def version(self):
+        result = []
+        for path in (self.path, self.path + "-wal"):
+            try:
+                st = os.stat(path)
+                result.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except OSError:
+                result.append(None)
+        return tuple(result)
+
+    def watch(self, *boxes):
+        # Commits in WAL mode land in the -wal file first
+        return watch([self.path, self.path + "-wal"])
+
+    def timeline(self):
+        rows = self._db().execute("SELECT * FROM messages ORDER BY timestamp, box, seq")
+        return [dict(self._record(row), box=row["box"]) for row in rows]
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    @staticmethod
+    def _record(row):
+        record = {column: row[column] for column in CORE_COLUMNS}
+        if row["extra"]:
+            record.update(json.loads(row["extra"]))
+        return record
+
+    def _import_logs(self):
+        """Copy an existing JSON Lines conversation into a freshly created database"""
+        source = JsonlStore(self.directory)
+        if not any(os.path.exists(log.path) or os.path.exists(log.legacy_path)
+                   for log in source.logs.values()):
+            return
+
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for box in BOXES:
+                for record in source.read_all(box):
+                    extra = {k: v for k, v in record.items() if k not in CORE_COLUMNS}
+                    db.execute(
+                        "INSERT OR IGNORE INTO messages "
+                        "(box, seq, timestamp, sender, message, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                        (box, record.get("seq", 0), record.get("timestamp", ""),
+                         record.get("sender", ""), record.get("message", ""),
+                         json.dumps(extra, ensure_ascii=False) if extra else None)
+                    )
+
+                # Keep consumers where they were so nothing is delivered twice
+                prefix = os.path.splitext(source.logs[box].path)[0] + "."
+                for path in glob.glob(glob.escape(prefix) + "*.cursor"):
+                    consumer = path[len(prefix):-len(".cursor")]
+                    db.execute(
+                        "INSERT OR REPLACE INTO cursors (box, consumer, seq) VALUES (?, ?, ?)",
+                        (box, consumer, ReadCursor(path).seq)
+                    )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        print(f"Imported existing conversation into {self.path}")
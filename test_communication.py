@@ -7,13 +7,27 @@ import json
 import os
 import time
 from assistant_bridge import AssistantBridge
+from message_store import open_log
+from file_watcher import watch, PollingWatcher
+from sqlite_store import SQLiteStore
+from socket_transport import MessageBroker, BrokerStore
+from timeline import TimelineCache
+from message_store import JsonlStore
+
+TEST_FILES = [
+    'assistant_inbox.json', 'assistant_outbox.json',
+    'assistant_inbox.json.migrated', 'assistant_outbox.json.migrated',
+    'assistant_inbox.jsonl', 'assistant_outbox.jsonl',
+    'assistant_inbox.assistant.cursor', 'assistant_inbox.idx', 'assistant_outbox.idx',
+    'assistant_messages.db', 'assistant_messages.db-wal', 'assistant_messages.db-shm',
+]
 
 def test_communication_system():
     print("Testing Communication System")
     print("=" * 50)
     
     # Clean up any existing files
-    for f in ['assistant_inbox.json', 'assistant_outbox.json']:
+    for f in TEST_FILES:
         if os.path.exists(f):
             os.remove(f)
             print(f"✓ Cleaned up {f}")
@@ -23,7 +37,7 @@ def test_communication_system():
     bridge = AssistantBridge()
     print("✓ Bridge initialized")
     
-    # Test 2: Send a test message (simulating user)
+    # Test 2: Send a test message (simulating user with the legacy format)
     print("\n[Test 2] Simulating user message...")
     with open('assistant_inbox.json', 'w') as f:
         json.dump([{
@@ -48,9 +62,8 @@ def test_communication_system():
     print("✓ Response sent")
     
     # Test 5: Verify response
-    print("\n[Test 5] Verifying response file...")
-    with open('assistant_outbox.json', 'r') as f:
-        responses = json.load(f)
+    print("\n[Test 5] Verifying response log...")
+    responses = open_log('outbox').read_all()
     assert len(responses) == 1, "Should have 1 response"
     assert responses[0]['message'] == "Test response from assistant"
     print(f"✓ Response verified")
@@ -58,18 +71,28 @@ def test_communication_system():
     
     # Test 6: Mark as read
     print("\n[Test 6] Checking read status...")
-    with open('assistant_inbox.json', 'r') as f:
-        inbox = json.load(f)
-    assert inbox[0]['read'] == True, "Message should be marked as read"
+    cursor = open_log('inbox').cursor('assistant')
+    assert cursor.seq == 1, "Cursor should point past the message"
+    assert bridge.get_new_messages() == [], "Message should not be returned twice"
+    assert not os.path.exists('assistant_inbox.json'), "Legacy file should be migrated"
     print("✓ Message marked as read")
     
-    # Test 7: Multiple messages
-    print("\n[Test 7] Testing multiple messages...")
+    # Test 7: Second consumer reads the same stream independently
+    print("\n[Test 7] Testing independent cursors...")
+    open_log('inbox').append("user", "Another message")
+    other = AssistantBridge(consumer="test-observer")
+    assert len(other.get_new_messages()) == 2, "New consumer should see the whole stream"
+    assert [m['message'] for m in bridge.get_new_messages()] == ["Another message"]
+    os.remove('assistant_inbox.test-observer.cursor')
+    print("✓ Cursors are independent")
+    
+    # Test 8: Multiple messages
+    print("\n[Test 8] Testing multiple messages...")
     bridge.send_message("Second message")
     bridge.send_message("Third message")
-    with open('assistant_outbox.json', 'r') as f:
-        responses = json.load(f)
+    responses = open_log('outbox').read_all()
     assert len(responses) == 3, "Should have 3 messages total"
+    assert [r['seq'] for r in responses] == [1, 2, 3], "Sequence numbers should increase"
     print(f"✓ Multiple messages handled ({len(responses)} total)")
     
     print("\n" + "=" * 50)
@@ -83,14 +106,293 @@ def test_communication_system():
     
     # Clean up
     print("\nCleaning up test files...")
-    for f in ['assistant_inbox.json', 'assistant_outbox.json']:
+    for f in TEST_FILES:
         if os.path.exists(f):
             os.remove(f)
     print("✓ Test files cleaned up")
 
+def test_file_watcher():
+    print("\nTesting file watchers")
+    for f in TEST_FILES:
+        if os.path.exists(f):
+            os.remove(f)
+    
+    log = open_log('inbox')
+    for factory in (watch, PollingWatcher):
+        watcher = factory([log.path])
+        assert watcher.wait(timeout=0.05) == False, "Nothing changed yet"
+        log.append("user", "wake up")
+        assert watcher.wait(timeout=2) == True, "Append should wake the watcher"
+        watcher.close()
+        print(f"✓ {type(watcher).__name__} wakes on append")
+    
+    os.remove(log.path)
+
+def test_sqlite_store():
+    print("\nTesting SQLite store")
+    for f in TEST_FILES:
+        if os.path.exists(f):
+            os.remove(f)
+    
+    # An existing JSON Lines conversation is imported on first use
+    open_log('inbox').append("user", "Already answered")
+    AssistantBridge().get_new_messages()
+    open_log('inbox').append("user", "Still pending")
+    
+    store = SQLiteStore()
+    bridge = AssistantBridge(store=store)
+    pending = bridge.get_new_messages()
+    assert [m['message'] for m in pending] == ["Still pending"], "Cursor should be imported"
+    print("✓ Existing conversation and cursor imported")
+    
+    store.append('inbox', "user", "Hello", priority="high")
+    bridge.send_message("Hi")
+    assert [m['message'] for m in bridge.get_new_messages()] == ["Hello"]
+    assert bridge.get_new_messages() == []
+    assert store.last('inbox', 1)[0]["priority"] == "high", "Extra fields should round-trip"
+    assert [m['message'] for m in store.timeline()][-1] == "Hi"
+    print("✓ Send, receive and timeline work")
+    
+    store.close()
+    for f in TEST_FILES:
+        if os.path.exists(f):
+            os.remove(f)
+
+def test_socket_transport():
+    print("\nTesting socket broker")
+    import threading
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "test.sock")
+        broker = MessageBroker(path)
+        threading.Thread(target=broker.serve_forever, daemon=True).start()
+        
+        user = BrokerStore(path)
+        bridge = AssistantBridge(store=BrokerStore(path))
+        user.append('inbox', "user", "Sent before subscribing")
+        assert bridge.wait_for_messages(timeout=1) == True
+        assert [m['message'] for m in bridge.get_new_messages()] == ["Sent before subscribing"]
+        
+        user.append('inbox', "user", "Pushed")
+        assert bridge.wait_for_messages(timeout=2) == True, "Push should wake the bridge"
+        assert [m['message'] for m in bridge.get_new_messages()] == ["Pushed"]
+        bridge.send_message("Reply")
+        assert [m['message'] for m in user.read_all('outbox')] == ["Reply"]
+        print("✓ Messages are pushed through the broker")
+        
+        user.close()
+        bridge.store.close()
+        broker.shutdown()
+        broker.server_close()
+
+def test_timeline_cache():
+    print("\nTesting timeline cache")
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        store = JsonlStore(tmp)
+        cache = TimelineCache(store)
+        store.append('inbox', "user", "one")
+        store.append('outbox', "assistant", "two")
+        cache.refresh()
+        assert [m['message'] for m in cache.messages] == ["one", "two"]
+        
+        renders = []
+        render = lambda messages: renders.append(1) or str(len(messages)).encode()
+        assert cache.body('all', render) == b"2"
+        cache.refresh()
+        assert cache.body('all', render) == b"2"
+        assert len(renders) == 1, "Unchanged timeline should not be serialized again"
+        
+        # Out-of-order clock: merged into place, not appended
+        store.append('inbox', "user", "late", timestamp="0000")
+        store.append('outbox', "assistant", "three")
+        cache.refresh()
+        assert [m['message'] for m in cache.messages] == ["late", "one", "two", "three"]
+        assert [m['message'] for m in cache.since({'inbox': 1, 'outbox': 1})] == ["late", "three"]
+        assert cache.body('all', render) == b"4"
+        print("✓ Timeline updates incrementally and caches responses")
+
+def test_history_pages():
+    print("\nTesting paginated history")
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl = JsonlStore(tmp)
+        for i in range(1, 121):
+            box = 'inbox' if i % 3 else 'outbox'
+            jsonl.append(box, "user", f"m{i}", timestamp=f"2025-01-01T10:{i // 60:02d}:{i % 60:02d}")
+        stores = [jsonl, SQLiteStore(tmp)]  # the database imports the logs
+        
+        for store in stores:
+            pages, before = [], None
+            while True:
+                page, before = store.history(before, 50)
+                pages.append([m['message'] for m in page])
+                if before is None:
+                    break
+            assert [len(p) for p in pages] == [50, 50, 20], [len(p) for p in pages]
+            seen = [m for page in reversed(pages) for m in page]
+            assert seen == [f"m{i}" for i in range(1, 121)], "Pages should cover everything once"
+            
+            position = store.position_at("2025-01-01T10:01:00")
+            page, _ = store.history(position, 5)
+            assert [m['message'] for m in page] == [f"m{i}" for i in range(55, 60)]
+        
+        # The index follows appends and survives the log being replaced
+        log = stores[0].logs['inbox']
+        assert os.path.exists(log.index.path)
+        stores[0].append('inbox', "user", "new")
+        assert [r['message'] for r in log.read_before(1000, 2)] == ["m119", "new"]
+        os.remove(log.path)
+        stores[0].append('inbox', "user", "fresh")
+        assert [r['message'] for r in log.read_before(1000, 5)] == ["fresh"]
+        print("✓ History pages seek through the offset index")
+        
+        bridge = AssistantBridge(store=stores[1])
+        messages, before = bridge.get_history(limit=3)
+        assert [m['message'] for m in messages] == ["m118", "m119", "m120"]
+        messages, _ = bridge.get_history(before, 3)
+        assert [m['message'] for m in messages] == ["m115", "m116", "m117"]
+        print("✓ AssistantBridge.get_history pages backwards")
+        stores[1].close()
+
+_worker_greeting = None
+
+def _warm_up(greeting):
+    global _worker_greeting
+    _worker_greeting = greeting
+
+def _slow_echo(msg):
+    # First message of each conversation is the slowest
+    time.sleep(0.3 if msg['message'].endswith("0") else 0.01)
+    return f"{_worker_greeting or 'echo'} {msg['message']}"
+
+def test_concurrent_dispatch():
+    print("\nTesting concurrent response dispatch")
+    import tempfile
+    import threading
+    
+    for processes in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = JsonlStore(tmp)
+            bridge = AssistantBridge(store=store)
+            for i in range(4):
+                for conversation in ("a", "b"):
+                    store.append('inbox', "user", f"{conversation}{i}", conversation=conversation)
+            
+            started = time.monotonic()
+            monitor = threading.Thread(target=bridge.monitor_and_respond, args=(_slow_echo,),
+                                       kwargs=dict(workers=4, processes=processes,
+                                                   initializer=_warm_up, initargs=("hi",)))
+            monitor.start()
+            while len(store.read_all('outbox')) < 8 and time.monotonic() - started < 10:
+                time.sleep(0.02)
+            elapsed = time.monotonic() - started
+            bridge.stop()
+            monitor.join()
+            
+            replies = store.read_all('outbox')
+            for conversation in ("a", "b"):
+                ordered = [r['message'] for r in replies if r.get('conversation') == conversation]
+                assert ordered == [f"hi {conversation}{i}" for i in range(4)], ordered
+            if not processes:
+                assert elapsed < 8 * 0.3, "Slow callbacks should run in parallel"
+            print(f"✓ {'Process' if processes else 'Thread'} pool keeps per-conversation order "
+                  f"({elapsed:.2f}s)")
+
+def test_async_bridge():
+    print("\nTesting AsyncAssistantBridge")
+    import asyncio
+    import tempfile
+    from assistant_bridge import AsyncAssistantBridge
+    
+    async def answer(msg):
+        await asyncio.sleep(0.2 if msg['message'].endswith("0") else 0.01)
+        return f"re {msg['message']}"
+    
+    async def scenario(store):
+        bridge = AsyncAssistantBridge(store=store)
+        monitor = asyncio.create_task(bridge.monitor_and_respond(answer, limit=100))
+        await asyncio.sleep(0.05)
+        
+        # The loop stays responsive while the bridge waits for messages
+        started = time.monotonic()
+        gaps = []
+        for _ in range(20):
+            tick = time.monotonic()
+            await asyncio.sleep(0.01)
+            gaps.append(time.monotonic() - tick)
+        assert max(gaps) < 0.1, f"Event loop blocked for {max(gaps):.2f}s"
+        
+        for i in range(3):
+            for conversation in ("a", "b"):
+                store.append('inbox', "user", f"{conversation}{i}", conversation=conversation)
+        while len(store.read_all('outbox')) < 6 and time.monotonic() - started < 5:
+            await asyncio.sleep(0.02)
+        bridge.stop()
+        await monitor
+        bridge.close()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        store = JsonlStore(tmp)
+        asyncio.run(scenario(store))
+        replies = store.read_all('outbox')
+        for conversation in ("a", "b"):
+            ordered = [r['message'] for r in replies if r.get('conversation') == conversation]
+            assert ordered == [f"re {conversation}{i}" for i in range(3)], ordered
+        print("✓ Async callbacks answer in per-conversation order without blocking the loop")
+
+def test_batch_send_and_ack():
+    print("\nTesting batch send and acknowledge")
+    import tempfile
+    import threading
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "batch.sock")
+        broker = MessageBroker(path, store=JsonlStore(tmp))
+        threading.Thread(target=broker.serve_forever, daemon=True).start()
+        
+        for store in (JsonlStore(tmp), SQLiteStore(tmp), BrokerStore(path)):
+            name = type(store).__name__
+            start = (store.last('inbox', 1) or [{'seq': 0}])[0]['seq']
+            records = store.append_many('inbox', [
+                {'sender': "user", 'message': f"bulk {i}", 'conversation': "c"} for i in range(5)
+            ])
+            assert [r['seq'] for r in records] == list(range(start + 1, start + 6)), name
+            assert store.read_after('inbox', start)[-1]['conversation'] == "c", name
+            
+            bridge = AssistantBridge(consumer=f"acker-{name}", store=store)
+            first = bridge.get_new_messages(ack=False)
+            assert bridge.ack([first[0], first[1]['seq'], first[3]])
+            assert store.get_cursor('inbox', bridge.consumer) == first[1]['seq'], name
+            
+            # Unacknowledged messages come back to the next reader
+            again = AssistantBridge(consumer=bridge.consumer, store=store)
+            redelivered = again.get_new_messages(ack=False)
+            assert redelivered[0]['seq'] == first[2]['seq'], name
+            
+            assert bridge.send_messages(["one", {'message': "two", 'conversation': "c"}])
+            replies = store.last('outbox', 2)
+            assert [r['message'] for r in replies] == ["one", "two"], name
+            assert replies[1]['sender'] == "assistant" and replies[1]['conversation'] == "c"
+            print(f"✓ {name}: batches written at once, acks move the cursor")
+        
+        broker.shutdown()
+        broker.server_close()
+
 if __name__ == "__main__":
     try:
         test_communication_system()
+        test_file_watcher()
+        test_sqlite_store()
+        test_socket_transport()
+        test_timeline_cache()
+        test_history_pages()
+        test_concurrent_dispatch()
+        test_async_bridge()
+        test_batch_send_and_ack()
     except AssertionError as e:
         print(f"\n✗ TEST FAILED: {e}")
         exit(1)
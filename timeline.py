@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Timeline Cache - In-memory merged conversation for readers that ask often
+Keeps the inbox and outbox merged in time order and only reads what was
+appended since the last look. Serialized responses are cached until the
+store changes, so repeated polls of an idle conversation cost almost nothing.
+"""
+
+import bisect
+import heapq
+import threading
+
+from message_store import start_position
+
+
+def _timestamp(msg):
+    return msg.get('timestamp', '')
+
+
+class _SeqView:
+    """Read-only sequence of the seq numbers of a record list, for bisect"""
+
+    def __init__(self, records):
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        return self.records[i]['seq']
+
+
+class TimelineCache:
+    """Process-wide merged timeline of one MessageStore"""
+
+    def __init__(self, store):
+        self.store = store
+        self.messages = []
+        self.position = start_position()
+        self._keys = []
+        self._boxes = {box: [] for box in self.position}
+        self._version = None
+        self._bodies = {}
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        """Bring the cache up to date; cheap when nothing changed"""
+        with self._lock:
+            version = self.store.version()
+            if version == self._version:
+                return
+            head = self.store.head()
+            if any(head[box] < seq for box, seq in self.position.items()):
+                # Store was reset or replaced - start over
+                self.messages, self._keys = [], []
+                self.position = start_position()
+                self._boxes = {box: [] for box in self.position}
+
+            new, self.position = self.store.read_since(self.position)
+            self._merge(new)
+            for msg in new:
+                self._boxes[msg['box']].append(msg)
+            self._version = version
+            self._bodies = {}
+
+    def since(self, position):
+        """Cached messages newer than a position, in time order"""
+        with self._lock:
+            tails = []
+            for box, records in self._boxes.items():
+                # Boxes are in seq order: find the cut with a binary search
+                seqs = _SeqView(records)
+                tails.append(records[bisect.bisect_right(seqs, position.get(box, 0)):])
+            return list(heapq.merge(*tails, key=_timestamp))
+
+    def newest(self):
+        with self._lock:
+            return self.messages[-1] if self.messages else None
+
+    def body(self, name, render):
+        """
+        Serialized response cached until the next change
+
+        render(messages) builds the bytes; name distinguishes different
+        representations of the same timeline.
+        """
+        with self._lock:
+            body = self._bodies.get(name)
+            if body is None:
+                body = self._bodies[name] = render(self.messages)
+            return body
+
+    def _merge(self, new):
+        if not new:
+            return
+        if not self.messages or _timestamp(new[0]) >= self._keys[-1]:
+            # Common case: everything new is newer than what we have
+            self.messages.extend(new)
+            self._keys.extend(_timestamp(m) for m in new)
+            return
+
+        # A writer with a lagging clock - merge the overlapping tail only
+        cut = bisect.bisect_right(self._keys, _timestamp(new[0]))
+        tail = list(heapq.merge(self.messages[cut:], new, key=_timestamp))
+        del self.messages[cut:]
+        del self._keys[cut:]
+        self.messages.extend(tail)
+        self._keys.extend(_timestamp(m) for m in tail)
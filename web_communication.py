@@ -4,26 +4,163 @@ Web-based Communication Interface (alternative to tkinter)
 Use this if tkinter is not available on your system
 """
 
+import gzip
+import hashlib
 import json
 import os
-from datetime import datetime
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
 import urllib.parse
 import threading
 import webbrowser
+from message_store import open_store, start_position, format_position, parse_position, parse_before
+from timeline import TimelineCache
+from email.utils import format_datetime
+from datetime import datetime, timezone
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Seconds between keep-alive comments on idle event streams
+STREAM_KEEPALIVE = 15
+
+# Requests handled at the same time; more connections wait to be accepted
+DEFAULT_WORKERS = 32
+# Open /api/stream connections; they idle most of the time and don't use a worker
+DEFAULT_MAX_STREAMS = 100
+
+
+# JSON responses larger than this are compressed when the client allows it
+COMPRESS_THRESHOLD = 1024
+
+# Messages per /api/messages?before= page: default and upper bound
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Preferred first; brotli only if the optional module is installed
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+
+def compress(body, encoding, level=6):
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(body, quality=min(level, 11))
+    return body
+
+
+def choose_encoding(accept_encoding, available=ENCODINGS):
+    """Pick the first of our encodings the Accept-Encoding header allows"""
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    
+    for encoding in ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return 'identity'
+
+
+class StaticAsset:
+    """Response body built once, with compressed variants and strong ETags"""
+    
+    def __init__(self, content, content_type):
+        body = content.encode('utf-8')
+        self.content_type = content_type
+        self.variants = {'identity': body}
+        for encoding in ENCODINGS:
+            self.variants[encoding] = compress(body, encoding, level=9)
+        self._hash = hashlib.sha256(body).hexdigest()[:20]
+        self.etags = {self.etag(encoding) for encoding in self.variants}
+    
+    def etag(self, encoding):
+        # Each encoding is a different representation and needs its own tag
+        suffix = '' if encoding == 'identity' else f'-{encoding}'
+        return f'"{self._hash}{suffix}"'
+
+
+class BoundedThreadingHTTPServer(ThreadingHTTPServer):
+    """Thread per request, but never more than `workers` requests in progress"""
+    
+    request_queue_size = 128
+    
+    def __init__(self, address, handler, workers=DEFAULT_WORKERS, max_streams=DEFAULT_MAX_STREAMS):
+        super().__init__(address, handler)
+        self.workers = threading.BoundedSemaphore(workers)
+        self.streams = threading.BoundedSemaphore(max_streams)
+        self._slot = threading.local()
+    
+    def process_request(self, request, client_address):
+        # Blocks the accept loop while every worker is busy (backpressure)
+        self.workers.acquire()
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self.workers.release()
+            raise
+    
+    def process_request_thread(self, request, client_address):
+        self._slot.held = True
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.release_worker()
+    
+    def release_worker(self):
+        """Give the worker slot back early (used by long-lived streams)"""
+        if getattr(self._slot, 'held', False):
+            self._slot.held = False
+            self.workers.release()
 
 class CommunicationHandler(BaseHTTPRequestHandler):
+    # Message store shared by all requests (every backend is thread-safe)
+    store = None
+    timeline = None
+    _store_lock = threading.Lock()
+    
+    @classmethod
+    def get_store(cls):
+        with cls._store_lock:
+            if cls.store is None:
+                cls.store = open_store()
+        return cls.store
+    
+    @classmethod
+    def get_timeline(cls):
+        """Process-wide cached timeline of the shared store"""
+        store = cls.get_store()
+        with cls._store_lock:
+            if cls.timeline is None or cls.timeline.store is not store:
+                cls.timeline = TimelineCache(store)
+        return cls.timeline
+    
     def log_message(self, format, *args):
         """Suppress default logging"""
         pass
     
     def do_GET(self):
         """Serve the main page or API endpoints"""
-        if self.path == '/' or self.path == '/index.html':
+        url = urllib.parse.urlparse(self.path)
+        self.query = urllib.parse.parse_qs(url.query)
+        
+        if url.path == '/' or url.path == '/index.html':
             self.serve_main_page()
-        elif self.path == '/api/messages':
+        elif url.path == '/api/messages' and ('before' in self.query or 'limit' in self.query):
+            self.get_history()
+        elif url.path == '/api/messages':
             self.get_messages()
-        elif self.path.startswith('/api/'):
+        elif url.path == '/api/stream':
+            self.stream_messages()
+        elif url.path.startswith('/api/'):
             self.send_response(404)
             self.end_headers()
         else:
@@ -38,8 +175,265 @@ class CommunicationHandler(BaseHTTPRequestHandler):
             self.end_headers()
     
     def serve_main_page(self):
-        """Serve the HTML interface"""
-        html = """
+        """Serve the HTML interface (prebuilt and precompressed at startup)"""
+        self.send_static(MAIN_PAGE)
+    
+    def send_static(self, asset):
+        """Send a StaticAsset in the best encoding the client accepts"""
+        encoding = choose_encoding(self.headers.get('Accept-Encoding', ''), asset.variants)
+        etag = asset.etag(encoding)
+        
+        if asset.etags & self._if_none_match():
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        
+        body = asset.variants[encoding]
+        self.send_response(200)
+        self.send_header('Content-type', asset.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    @staticmethod
+    def _public(msg):
+        """Fields of a stored record that are sent to the browser"""
+        return {
+            'id': f"{msg['box']}-{msg.get('seq', 0)}",
+            'box': msg['box'],
+            'seq': msg.get('seq', 0),
+            'sender': msg.get('sender', ''),
+            'message': msg.get('message', ''),
+            'timestamp': msg.get('timestamp', '')
+        }
+    
+    def get_messages(self):
+        """
+        Get all messages, or only newer ones with ?since=
+        
+        since is a position token ("12-7", see the ETag) or an ISO timestamp.
+        The ETag names the newest message, so a poll with If-None-Match
+        gets a bodyless 304 when nothing changed.
+        """
+        timeline = self.get_timeline()
+        timeline.refresh()
+        # Weak: the same tag covers the plain and compressed representations
+        etag = f'W/"{format_position(timeline.position)}"'
+        
+        if etag.removeprefix('W/') in self._if_none_match():
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        
+        since = self.query.get('since', [None])[0]
+        encoding = choose_encoding(self.headers.get('Accept-Encoding', ''))
+        try:
+            if since is None:
+                # Serialized (and compressed) once per change, then served from memory
+                body = timeline.body('identity', self._render)
+                if len(body) > COMPRESS_THRESHOLD and encoding != 'identity':
+                    body = timeline.body(encoding, lambda _: compress(body, encoding))
+                else:
+                    encoding = 'identity'
+            else:
+                if 'T' in since or ':' in since:
+                    body = self._render([m for m in timeline.since(start_position())
+                                         if m.get('timestamp', '') > since])
+                else:
+                    body = self._render(timeline.since(parse_position(since)))
+                body, encoding = self._compress(body)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        last_modified = self._last_modified(timeline.newest())
+        if last_modified:
+            self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def get_history(self):
+        """
+        One page of older messages: ?before=<token>&limit=<n>
+        
+        Without before the newest page is returned. The response holds the
+        messages (oldest first) and the before token of the next older page,
+        null once the start of the conversation is reached. The newest page
+        also carries the current position, to continue with ?since= or
+        /api/stream.
+        """
+        store = self.get_store()
+        head = None
+        try:
+            before = self.query.get('before', [None])[0]
+            limit = int(self.query.get('limit', [DEFAULT_PAGE_SIZE])[0])
+            if not 0 < limit <= MAX_PAGE_SIZE:
+                raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+            if before:
+                before = parse_before(store, before)
+            else:
+                # Read first, so nothing appended meanwhile falls between page and stream
+                head = store.head()
+                before = {box: seq + 1 for box, seq in head.items()}
+            messages, before = store.history(before, limit)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        
+        page = {
+            'messages': [self._public(msg) for msg in messages],
+            'before': before and format_position(before),
+        }
+        if head is not None:
+            page['position'] = format_position(head)
+        body, encoding = self._compress(json.dumps(page).encode())
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _compress(self, body):
+        """Compress a response body if it is worth it; returns (body, encoding)"""
+        encoding = choose_encoding(self.headers.get('Accept-Encoding', ''))
+        if len(body) > COMPRESS_THRESHOLD and encoding != 'identity':
+            return compress(body, encoding), encoding
+        return body, 'identity'
+    
+    @classmethod
+    def _render(cls, messages):
+        return json.dumps([cls._public(msg) for msg in messages]).encode()
+    
+    def _if_none_match(self):
+        header = self.headers.get('If-None-Match', '')
+        return {tag.strip().removeprefix('W/') for tag in header.split(',') if tag.strip()}
+    
+    @staticmethod
+    def _last_modified(newest):
+        """HTTP date of the newest message, or None for an empty conversation"""
+        if newest is None:
+            return None
+        try:
+            moment = datetime.fromisoformat(newest.get('timestamp', '').replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+    
+    def stream_messages(self):
+        """Push new messages to the browser as Server-Sent Events"""
+        store = self.get_store()
+        
+        # Resume point: reconnect header, then ?since=, else only new messages
+        token = self.headers.get('Last-Event-ID') or self.query.get('since', [None])[0]
+        try:
+            position = parse_position(token) if token else None
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        
+        # Streams idle most of the time: count them separately from workers
+        server = self.server
+        if isinstance(server, BoundedThreadingHTTPServer):
+            if not server.streams.acquire(blocking=False):
+                self.send_response(503)
+                self.send_header('Retry-After', '5')
+                self.end_headers()
+                return
+            server.release_worker()
+        
+        try:
+            self._stream_events(store, position)
+        finally:
+            if isinstance(server, BoundedThreadingHTTPServer):
+                server.streams.release()
+    
+    def _stream_events(self, store, position):
+        watcher = store.watch()
+        if position is None:
+            position = store.head()
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Accel-Buffering', 'no')
+        self.end_headers()
+        
+        try:
+            while True:
+                messages, _ = store.read_since(position)
+                if messages:
+                    events = []
+                    for msg in messages:
+                        # Each event id resumes right after that message
+                        position[msg['box']] = max(position[msg['box']], msg['seq'])
+                        events.append(
+                            f"id: {format_position(position)}\n"
+                            f"data: {json.dumps(self._public(msg))}\n\n"
+                        )
+                    self.wfile.write("".join(events).encode())
+                    self.wfile.flush()
+                
+                if not watcher.wait(timeout=STREAM_KEEPALIVE):
+                    # Also detects browsers that went away
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            watcher.close()
+    
+    def send_message(self):
+        """Send a message (or a batch of messages) from user"""
+        content_length = int(self.headers['Content-Length'])
+        post_data = self.rfile.read(content_length)
+        
+        try:
+            data = json.loads(post_data.decode())
+            # {"message": "..."} or a batch: {"messages": ["...", ...]}
+            batch = data.get('messages', [data.get('message', '')])
+            messages = [m.strip() for m in batch if isinstance(m, str) and m.strip()] \
+                if isinstance(batch, list) else []
+            
+            if messages:
+                # Append to the inbox, all in one write
+                self.get_store().append_many('inbox', [
+                    {'sender': "user", 'message': message} for message in messages
+                ])
+                
+                self.send_response(200)
+                self.send_header('Content-type', 'application/json')
+                self.end_headers()
+                self.wfile.write(json.dumps({"success": True, "count": len(messages)}).encode())
+            else:
+                self.send_response(400)
+                self.end_headers()
+        except Exception as e:
+            print(f"Error: {e}")
+            self.send_response(500)
+            self.end_headers()
+
+MAIN_PAGE_HTML = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -78,6 +472,8 @@ class CommunicationHandler(BaseHTTPRequestHandler):
         .messages {
             flex: 1;
             overflow-y: auto;
+            /* Scroll position is kept by hand when nodes are added or recycled */
+            overflow-anchor: none;
             padding: 20px;
             background: #f5f5f5;
         }
@@ -87,6 +483,8 @@ class CommunicationHandler(BaseHTTPRequestHandler):
             border-radius: 10px;
             max-width: 80%;
             word-wrap: break-word;
+        }
+        .message.new {
             animation: fadeIn 0.3s;
         }
         @keyframes fadeIn {
@@ -177,31 +575,132 @@ class CommunicationHandler(BaseHTTPRequestHandler):
     </div>
 
     <script>
-        let lastMessageCount = 0;
+        // Messages loaded so far, oldest first. Only items[first..last) have
+        // nodes in the page; the rest are rendered again when scrolled to.
+        const PAGE_SIZE = 50;   // messages per history request and render step
+        const MAX_NODES = 200;  // message nodes kept in the page at once
+        const EDGE = 300;       // pixels from the top/bottom that load more
+
+        const messagesDiv = document.getElementById('messages');
+        const items = [];
+        const known = new Set();
+        let first = 0, last = 0;
+        // Next older history page ("inbox-outbox" token), null at the start
+        let before = null;
+        let loadingOlder = false;
+        // Highest sequence number seen per box, sent back as "inbox-outbox"
+        const position = { inbox: 0, outbox: 0 };
+        let stream = null;
+        let pending = [];
+
+        function positionToken() {
+            return position.inbox + '-' + position.outbox;
+        }
+
+        function renderNode(msg, animate) {
+            const div = document.createElement('div');
+            div.className = 'message ' + msg.sender + (animate ? ' new' : '');
+            const sender = document.createElement('div');
+            sender.className = 'sender';
+            sender.textContent = msg.sender === 'user' ? 'Vi' : 'Asistent';
+            const text = document.createElement('div');
+            text.className = 'text';
+            text.textContent = msg.message;
+            div.append(sender, text);
+            return div;
+        }
+
+        function nearBottom() {
+            return messagesDiv.scrollHeight - messagesDiv.scrollTop - messagesDiv.clientHeight < EDGE;
+        }
+
+        // Render up to PAGE_SIZE older items above the window, keeping the view still
+        function showOlder() {
+            const from = Math.max(0, first - PAGE_SIZE);
+            if (from === first) return false;
+            const fragment = document.createDocumentFragment();
+            for (let i = from; i < first; i++) fragment.appendChild(renderNode(items[i], false));
+            const height = messagesDiv.scrollHeight;
+            messagesDiv.insertBefore(fragment, messagesDiv.firstChild);
+            messagesDiv.scrollTop += messagesDiv.scrollHeight - height;
+            first = from;
+
+            // Recycle the nodes furthest below the view
+            while (last - first > MAX_NODES) {
+                messagesDiv.lastChild.remove();
+                last--;
+            }
+            return true;
+        }
+
+        // Render up to count newer items below the window
+        function showNewer(count, animate) {
+            const to = Math.min(items.length, last + count);
+            if (to === last) return;
+            const fragment = document.createDocumentFragment();
+            for (let i = last; i < to; i++) fragment.appendChild(renderNode(items[i], animate));
+            messagesDiv.appendChild(fragment);
+            last = to;
+        }
+
+        // Recycle the nodes furthest above the view
+        function trimTop() {
+            const excess = last - first - MAX_NODES;
+            if (excess <= 0) return;
+            const height = messagesDiv.scrollHeight;
+            for (let i = 0; i < excess; i++) messagesDiv.firstChild.remove();
+            messagesDiv.scrollTop -= height - messagesDiv.scrollHeight;
+            first += excess;
+        }
+
+        function loadOlder() {
+            if (before === null || loadingOlder) return;
+            loadingOlder = true;
+            fetch('/api/messages?before=' + before + '&limit=' + PAGE_SIZE)
+                .then(r => r.json())
+                .then(data => {
+                    const older = data.messages.filter(msg => !known.has(msg.id));
+                    older.forEach(msg => known.add(msg.id));
+                    items.unshift(...older);
+                    first += older.length;
+                    last += older.length;
+                    before = data.before;
+                    showOlder();
+                })
+                .catch(err => console.error('Error loading history:', err))
+                .finally(() => { loadingOlder = false; });
+        }
+
+        // Add new messages; they are drawn right away if the newest are on screen
+        function receive(messages, animate = true) {
+            const follow = last === items.length && nearBottom();
+            const showing = last === items.length;
+            for (const msg of messages) {
+                if (known.has(msg.id)) continue;
+                known.add(msg.id);
+                items.push(msg);
+                position[msg.box] = Math.max(position[msg.box], msg.seq);
+            }
+            if (!showing) return;
+            showNewer(items.length - last, animate);
+            if (follow) {
+                trimTop();
+                messagesDiv.scrollTop = messagesDiv.scrollHeight;
+            }
+        }
 
         function loadMessages() {
-            fetch('/api/messages')
+            // Newest page only; older pages are fetched while scrolling up
+            fetch('/api/messages?limit=' + PAGE_SIZE)
                 .then(r => r.json())
                 .then(data => {
-                    const messagesDiv = document.getElementById('messages');
-                    messagesDiv.innerHTML = '';
-                    
-                    data.forEach(msg => {
-                        const div = document.createElement('div');
-                        div.className = 'message ' + msg.sender;
-                        div.innerHTML = `
-                            <div class="sender">${msg.sender === 'user' ? 'Vi' : 'Asistent'}</div>
-                            <div class="text">${escapeHtml(msg.message)}</div>
-                        `;
-                        messagesDiv.appendChild(div);
-                    });
-                    
+                    const [inbox, outbox] = data.position.split('-').map(Number);
+                    position.inbox = inbox;
+                    position.outbox = outbox;
+                    before = data.before;
+                    receive(data.messages, false);
                     messagesDiv.scrollTop = messagesDiv.scrollHeight;
-                    
-                    if (data.length > lastMessageCount) {
-                        updateStatus('Nova poruka primljena');
-                        lastMessageCount = data.length;
-                    }
+                    openStream();
                 })
                 .catch(err => {
                     console.error('Error loading messages:', err);
@@ -209,6 +708,53 @@ class CommunicationHandler(BaseHTTPRequestHandler):
                 });
         }
 
+        function pollMessages() {
+            fetch('/api/messages?since=' + positionToken())
+                .then(r => r.json())
+                .then(messages => receive(messages))
+                .catch(err => console.error('Error loading messages:', err))
+                .finally(() => setTimeout(pollMessages, 1000));
+        }
+
+        function openStream() {
+            if (stream) return;
+            if (!window.EventSource) {
+                // Very old browsers: fall back to polling for new messages
+                stream = true;
+                pollMessages();
+                return;
+            }
+
+            // Server pushes only messages newer than what we already have.
+            // On reconnect the browser resumes from the last event id.
+            stream = new EventSource('/api/stream?since=' + positionToken());
+            stream.onmessage = e => {
+                const msg = JSON.parse(e.data);
+                // Bursts are drawn together, once per frame
+                if (!pending.length) {
+                    requestAnimationFrame(() => {
+                        const batch = pending;
+                        pending = [];
+                        receive(batch);
+                    });
+                }
+                pending.push(msg);
+                if (msg.sender !== 'user') {
+                    updateStatus('Nova poruka primljena');
+                }
+            };
+            stream.onerror = () => updateStatus('Veza prekinuta, ponovno spajanje...');
+        }
+
+        messagesDiv.addEventListener('scroll', () => {
+            if (messagesDiv.scrollTop < EDGE) {
+                if (!showOlder()) loadOlder();
+            } else if (nearBottom() && last < items.length) {
+                showNewer(PAGE_SIZE, false);
+                trimTop();
+            }
+        }, { passive: true });
+
         function sendMessage() {
             const input = document.getElementById('messageInput');
             const message = input.value.trim();
@@ -224,7 +770,6 @@ class CommunicationHandler(BaseHTTPRequestHandler):
             .then(data => {
                 if (data.success) {
                     input.value = '';
-                    loadMessages();
                     updateStatus('Poruka poslana');
                 }
             })
@@ -242,12 +787,6 @@ class CommunicationHandler(BaseHTTPRequestHandler):
             }, 3000);
         }
 
-        function escapeHtml(text) {
-            const div = document.createElement('div');
-            div.textContent = text;
-            return div.innerHTML;
-        }
-
         // Keyboard shortcut
         document.getElementById('messageInput').addEventListener('keydown', e => {
             if (e.ctrlKey && e.key === 'Enter') {
@@ -255,99 +794,21 @@ class CommunicationHandler(BaseHTTPRequestHandler):
             }
         });
 
-        // Auto-refresh messages
-        setInterval(loadMessages, 1000);
+        // Newest history, then live updates over /api/stream
         loadMessages();
     </script>
 </body>
 </html>
-        """
-        
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html; charset=utf-8')
-        self.end_headers()
-        self.wfile.write(html.encode())
-    
-    def get_messages(self):
-        """Get all messages"""
-        messages = []
-        
-        # Load user messages (inbox)
-        if os.path.exists('assistant_inbox.json'):
-            try:
-                with open('assistant_inbox.json', 'r') as f:
-                    inbox = json.load(f)
-                    for msg in inbox:
-                        messages.append({
-                            'sender': 'user',
-                            'message': msg.get('message', ''),
-                            'timestamp': msg.get('timestamp', '')
-                        })
-            except (json.JSONDecodeError, FileNotFoundError, PermissionError, KeyError):
-                pass
-        
-        # Load assistant messages (outbox)
-        if os.path.exists('assistant_outbox.json'):
-            try:
-                with open('assistant_outbox.json', 'r') as f:
-                    outbox = json.load(f)
-                    for msg in outbox:
-                        messages.append({
-                            'sender': 'assistant',
-                            'message': msg.get('message', ''),
-                            'timestamp': msg.get('timestamp', '')
-                        })
-            except (json.JSONDecodeError, FileNotFoundError, PermissionError, KeyError):
-                pass
-        
-        # Sort by timestamp
-        messages.sort(key=lambda x: x.get('timestamp', ''))
-        
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.end_headers()
-        self.wfile.write(json.dumps(messages).encode())
-    
-    def send_message(self):
-        """Send a message from user"""
-        content_length = int(self.headers['Content-Length'])
-        post_data = self.rfile.read(content_length)
-        
-        try:
-            data = json.loads(post_data.decode())
-            message = data.get('message', '').strip()
-            
-            if message:
-                # Load existing messages
-                if os.path.exists('assistant_inbox.json'):
-                    with open('assistant_inbox.json', 'r') as f:
-                        messages = json.load(f)
-                else:
-                    messages = []
-                
-                # Add new message
-                messages.append({
-                    "timestamp": datetime.now().isoformat(),
-                    "sender": "user",
-                    "message": message,
-                    "read": False
-                })
-                
-                # Save
-                with open('assistant_inbox.json', 'w') as f:
-                    json.dump(messages, f, indent=2)
-                
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"success": True}).encode())
-            else:
-                self.send_response(400)
-                self.end_headers()
-        except Exception as e:
-            print(f"Error: {e}")
-            self.send_response(500)
-            self.end_headers()
+"""
+
+MAIN_PAGE = StaticAsset(MAIN_PAGE_HTML, 'text/html; charset=utf-8')
+
+def make_server(port, workers=None, single_threaded=False):
+    """Create the HTTP server; workers defaults to $ASSISTANT_WEB_WORKERS or 32"""
+    if single_threaded:
+        return HTTPServer(('localhost', port), CommunicationHandler)
+    workers = workers or int(os.environ.get('ASSISTANT_WEB_WORKERS', DEFAULT_WORKERS))
+    return BoundedThreadingHTTPServer(('localhost', port), CommunicationHandler, workers=workers)
 
 def main():
     PORT = 8080
@@ -360,7 +821,8 @@ def main():
     print(f"  http://localhost:{PORT}")
     print("\nPritisnite Ctrl+C za izlaz\n")
     
-    server = HTTPServer(('localhost', PORT), CommunicationHandler)
+    # Concurrent, so one slow client or an open event stream blocks nobody
+    server = make_server(PORT)
     
     # Try to open browser automatically
     threading.Timer(1.5, lambda: webbrowser.open(f'http://localhost:{PORT}')).start()